@@ -1,35 +1,98 @@
 # app.py
-from flask import Flask, render_template, request, jsonify
-import tensorflow as tf
-import pickle
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 import numpy as np
+import json
 import os
 import sys
+from functools import partial
 
 # add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from preprocessing import TextPreprocessor
+from preprocessing import TextPreprocessor, LemmaCache, get_lemma_table_path
+from feature_engineering import get_vocab_path
+from serving import (
+    ModelRegistry, SharedModelStore, UnknownModelError, MicroBatcher, PredictionCache,
+    get_length_buckets, load_inference_model, label_prediction, read_batch_texts,
+    predict_cached, iter_ndjson_answers, process_memory
+)
 
 app = Flask(__name__)
 
-# Load model and tokenizer
+# every models/best_<name>.h5 can be picked per request with ?model=<name>;
+# each is loaded on first use and reloaded when its checkpoint changes
+DEFAULT_MODEL = os.environ.get('SENTIMENT_DEFAULT_MODEL', 'hybrid')
+
+# rows are cut to the smallest of these lengths that holds them, for models
+# whose output does not depend on padding (SENTIMENT_LENGTH_BUCKETS)
+length_buckets = get_length_buckets()
+
+# under serve_prefork.py, weights and vocabulary come from the read-only
+# store the parent exported instead of a private copy per worker
+SHARED_STORE = os.environ.get('SENTIMENT_SHARED_STORE')
+if SHARED_STORE:
+    store = SharedModelStore(SHARED_STORE, buckets=length_buckets)
+    registry = ModelRegistry('models', default=DEFAULT_MODEL, load_model=store.load_model,
+                             load_vocab=store.load_vocabulary, vocab_path=get_vocab_path())
+else:
+    registry = ModelRegistry('models', default=DEFAULT_MODEL,
+                             load_model=partial(load_inference_model, buckets=length_buckets))
+
+# Load the default model and vocabulary now so a broken setup fails at startup
 print("Loading model...")
-model = tf.keras.models.load_model('models/best_hybrid.h5')
+registry.get()
+
+# warm-start lemmatization from the table written by the last training run
+lemma_cache = None
+if os.path.exists(get_lemma_table_path()):
+    lemma_cache = LemmaCache.load()
+preprocessor = TextPreprocessor(lemma_cache=lemma_cache)
+
+# concurrent /predict requests are coalesced into one forward pass
+BATCH_MAX_SIZE = int(os.environ.get('SENTIMENT_BATCH_MAX_SIZE', 32))
+BATCH_MAX_WAIT_MS = float(os.environ.get('SENTIMENT_BATCH_MAX_WAIT_MS', 5))
+
+# /predict/batch limits: request body size (Flask answers 413 above it)
+# and the number of texts scored in one forward pass
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('SENTIMENT_MAX_PAYLOAD_BYTES', 8 * 1024 * 1024))
+MAX_BATCH_TEXTS = int(os.environ.get('SENTIMENT_MAX_BATCH_TEXTS', 1000))
+
+# predictions for repeated reviews, keyed on the served model's version
+# (checkpoint and vocabulary file stats) and the preprocessed text, so a
+# reloaded model never answers from its predecessor's entries
+CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE', 10000))
+CACHE_TTL_S = float(os.environ.get('SENTIMENT_CACHE_TTL_S', 3600))
+
+prediction_cache = PredictionCache(CACHE_SIZE, CACHE_TTL_S)
+
 
-print("Loading tokenizer...")
-with open('artifacts/tokenizer.pickle', 'rb') as f:
-    tokenizer = pickle.load(f)
+def predict_texts(texts, served):
+    # one forward pass over the misses of the whole batch
+    return predict_cached(texts, served.version, prediction_cache,
+                          preprocess=partial(preprocessor.preprocess_reviews, verbose=False),
+                          predict=lambda misses: served.predict(served.encode(misses)))
 
-preprocessor = TextPreprocessor()
-MAX_LENGTH = 200
+
+batcher = MicroBatcher(
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+)
 
 @app.route('/')
 def home():
     return render_template('index.html')
 
+@app.errorhandler(UnknownModelError)
+def unknown_model(e):
+    return jsonify({
+        'error': e.args[0],
+        'success': False
+    }), 404
+
 @app.route('/predict', methods=['POST'])
 def predict():
+    # held for the whole request, so a hot swap cannot pull it away mid-way
+    served = registry.get(request.args.get('model'))
     try:
         # Get text from request
         text = request.json['text']
@@ -44,23 +107,20 @@ def predict():
         cleaned = preprocessor.clean_text(text)
         tokens = preprocessor.tokenize_and_lemmatize(cleaned)
         processed = ' '.join(tokens)
-        
-        # Tokenize and pad
-        sequence = tokenizer.texts_to_sequences([processed])
-        padded = tf.keras.preprocessing.sequence.pad_sequences(
-            sequence, maxlen=MAX_LENGTH, padding='post', truncating='post'
-        )
-        
-        # Make prediction
-        prediction = model.predict(padded, verbose=0)[0][0]
+
+        # Reuse the prediction for a review that normalizes the same way
+        prediction = prediction_cache.get((served.version, processed))
+
+        if prediction is None:
+            # Tokenize and pad
+            padded = served.encode([processed])
+
+            # Make prediction (batched with any concurrent requests)
+            prediction = float(batcher.predict(padded[0], predict_fn=served.predict))
+            prediction_cache.put((served.version, processed), prediction)
 
         # Determine sentiment
-        if prediction > 0.5:
-            sentiment = "Positive"
-            confidence = float(prediction)
-        else:
-            sentiment = "Negative"
-            confidence = float(1 - prediction)
+        sentiment, confidence = label_prediction(prediction)
 
         return jsonify({
             'sentiment': sentiment,
@@ -74,5 +134,66 @@ def predict():
             'success': False
         })
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    served = registry.get(request.args.get('model'))
+    if request.mimetype == 'application/x-ndjson':
+        return predict_batch_stream(served)
+
+    # a body over MAX_CONTENT_LENGTH raises 413 here, before any parsing
+    payload = request.get_json(silent=True)
+    try:
+        texts = read_batch_texts(payload)
+    except ValueError as e:
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), 400
+
+    if len(texts) > MAX_BATCH_TEXTS:
+        return jsonify({
+            'error': f'At most {MAX_BATCH_TEXTS} texts per request',
+            'success': False
+        }), 413
+
+    try:
+        results = predict_texts(texts, served) if texts else []
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'success': False
+        })
+
+    return jsonify({
+        'results': results,
+        'count': len(results),
+        'success': True
+    })
+
+def predict_batch_stream(served):
+    # NDJSON in, NDJSON out: score MAX_BATCH_TEXTS lines at a time and
+    # stream each chunk of answers back before reading the next, one per
+    # input line (a malformed line gets an error object in its place)
+    def generate():
+        try:
+            for answer in iter_ndjson_answers(request.stream, partial(predict_texts, served=served),
+                                              MAX_BATCH_TEXTS):
+                yield json.dumps(answer) + '\n'
+        except Exception as e:
+            # the status line has already gone out, so report in-band
+            yield json.dumps({'error': str(e), 'success': False}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/metrics')
+def metrics():
+    return jsonify({
+        'models': registry.stats(),
+        'batcher': batcher.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'process': dict(process_memory(), pid=os.getpid())
+    })
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    # threaded so concurrent requests can share a batch
+    app.run(debug=True, threaded=True)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# benchmark: keras texts_to_sequences + pad_sequences vs Vocabulary.encode
+
+import sys
+import os
+import time
+import numpy as np
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from preprocessing import load_preprocessed_corpus
+from feature_engineering import Vocabulary, MAX_WORDS, MAX_LEN
+from tensorflow.keras.preprocessing.text import Tokenizer
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main(repeats=5):
+    reviews, labels = load_preprocessed_corpus()
+
+    tokenizer = Tokenizer(num_words=MAX_WORDS, oov_token='<OOV>')
+    tokenizer.fit_on_texts(reviews)
+    vocab = Vocabulary.from_tokenizer(tokenizer, MAX_LEN)
+
+    def keras_path():
+        sequences = tokenizer.texts_to_sequences(reviews)
+        return pad_sequences(sequences, maxlen=MAX_LEN, padding='post', truncating='post')
+
+    def numpy_path():
+        return vocab.encode(reviews)
+
+    expected, keras_time = best_of(keras_path, repeats)
+    encoded, numpy_time = best_of(numpy_path, repeats)
+
+    assert np.array_equal(expected, encoded), "encoders disagree"
+
+    print(f"\nEncoding {len(reviews)} reviews to ({len(reviews)}, {MAX_LEN}), best of {repeats}")
+    print(f"keras tokenizer + pad_sequences: {keras_time * 1000:7.1f} ms, "
+          f"{expected.dtype}, {expected.nbytes / 1e6:.1f} MB")
+    print(f"Vocabulary.encode:               {numpy_time * 1000:7.1f} ms, "
+          f"{encoded.dtype}, {encoded.nbytes / 1e6:.1f} MB")
+    print(f"Speedup: {keras_time / numpy_time:.2f}x, outputs identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# benchmark: model.predict vs the traced InferenceModel forward pass
+
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from preprocessing import load_preprocessed_corpus
+from feature_engineering import load_vocabulary
+from serving import InferenceModel, LENGTH_BUCKETS
+from model import load_saved_model
+
+
+def latencies(fn, inputs):
+    times = []
+    for rows in inputs:
+        start = time.perf_counter()
+        fn(rows)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def report(name, times):
+    print(f"{name:28s} p50 {np.percentile(times, 50):7.2f} ms   "
+          f"p99 {np.percentile(times, 99):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare model.predict with InferenceModel latency')
+    parser.add_argument('--model', default='models/best_hybrid.h5')
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    model = load_saved_model(args.model)
+    vocab = load_vocabulary()
+    reviews, labels = load_preprocessed_corpus()
+    encoded = vocab.encode(reviews[:args.requests * 8])
+    inference = InferenceModel(model, vocab.max_len)
+    bucketed = InferenceModel(model, vocab.max_len, buckets=LENGTH_BUCKETS)
+
+    def keras_path(rows):
+        return model.predict(rows, verbose=0)
+
+    expected = keras_path(encoded[:64])
+    assert np.allclose(expected, inference(encoded[:64]), atol=1e-5), "paths disagree"
+
+    print(f"\n{args.model}, {args.requests} requests per case after warm-up")
+    for batch_size in [1, 8]:
+        inputs = [encoded[i:i + batch_size]
+                  for i in range(0, args.requests * batch_size, batch_size)]
+        for fn in [keras_path, inference]:
+            fn(inputs[0])
+
+        keras_times = latencies(keras_path, inputs)
+        traced_times = latencies(inference, inputs)
+        report(f"model.predict, batch {batch_size}", keras_times)
+        report(f"InferenceModel, batch {batch_size}", traced_times)
+        print(f"p50 speedup: {np.percentile(keras_times, 50) / np.percentile(traced_times, 50):.1f}x")
+
+        if bucketed.buckets:
+            bucketed(inputs[0])
+            bucketed_times = latencies(bucketed, inputs)
+            report(f"length buckets, batch {batch_size}", bucketed_times)
+            print(f"p50 speedup over padded: "
+                  f"{np.percentile(traced_times, 50) / np.percentile(bucketed_times, 50):.1f}x")
+        print()
+
+
+if __name__ == "__main__":
+    main()
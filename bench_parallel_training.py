@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# benchmark: training lstm, cnn and hybrid one after another vs in parallel
+#
+#   python bench_parallel_training.py --epochs 2
+#
+# Both runs use the same prepared split and a fixed number of epochs
+# (no early stopping), without plots or quantized exports, so only the
+# training itself is timed.
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from train import train_models, prepare_training_data, MODEL_BUILDERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sequential and parallel multi-model training')
+    parser.add_argument('--models', nargs='+', choices=sorted(MODEL_BUILDERS),
+                        default=list(MODEL_BUILDERS))
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    data = prepare_training_data()
+    wall_times = {}
+    with tempfile.TemporaryDirectory() as models_dir:
+        config = {
+            'epochs': args.epochs,
+            'batch_size': args.batch_size,
+            'early_stopping_patience': args.epochs,
+            'models_dir': models_dir,
+            'quantize': False,
+            'plots': False,
+            'save_final': False,
+            'verbose': 0,
+        }
+        for mode, parallel in [('sequential', False), ('parallel', True)]:
+            start = time.perf_counter()
+            train_models(args.models, config, data=data, parallel=parallel)
+            wall_times[mode] = time.perf_counter() - start
+
+    print(f"\n{', '.join(args.models)}: {args.epochs} epochs, batch size {args.batch_size}, "
+          f"{os.cpu_count()} cores")
+    for mode, wall_time in wall_times.items():
+        print(f"{mode:>10}  {wall_time:8.1f} s")
+    print(f"Speedup: {wall_times['sequential'] / wall_times['parallel']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
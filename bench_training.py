@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# A/B benchmark: padded NumPy arrays vs the bucketed tf.data pipeline
+#
+#   python bench_training.py --model lstm --epochs 3 --batch-size 32
+#
+# Both runs start from the same seed and data split and train for the same
+# number of epochs, without early stopping, so epoch time and accuracy are
+# directly comparable.
+
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from preprocessing import load_preprocessed_corpus, remove_outliers
+from feature_engineering import TextEncoder
+from model import create_lstm_model, create_cnn_model, create_hybrid_model
+from train import fit_inputs, sequence_lengths
+import tensorflow as tf
+
+MODELS = {
+    'lstm': create_lstm_model,
+    'cnn': create_cnn_model,
+    'hybrid': create_hybrid_model,
+}
+
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    def on_train_begin(self, logs=None):
+        self.times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.times.append(time.perf_counter() - self._start)
+
+
+def run(create_model, data, vocab_size, args, bucketed):
+    X_train, X_val, X_test, y_train, y_val, y_test = data
+
+    tf.keras.utils.set_random_seed(42)
+    model = create_model(vocab_size, X_train.shape[1])
+    timer = EpochTimer()
+    history = model.fit(
+        **fit_inputs(X_train, y_train, X_val, y_val, args.batch_size, bucketed),
+        epochs=args.epochs,
+        callbacks=[timer],
+        verbose=0
+    )
+    _, test_acc, _ = model.evaluate(X_test, y_test, batch_size=256, verbose=0)
+    return {
+        # the first epoch also pays for tracing
+        'first_epoch_s': timer.times[0],
+        'epoch_s': float(np.mean(timer.times[1:] or timer.times)),
+        'val_accuracy': history.history['val_accuracy'][-1],
+        'test_accuracy': test_acc,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare padded and bucketed training input pipelines')
+    parser.add_argument('--model', choices=sorted(MODELS), default='lstm')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    processed_reviews, labels = load_preprocessed_corpus()
+    processed_reviews, labels = remove_outliers(processed_reviews, labels)
+    encoder = TextEncoder(max_words=10000, max_len=200)
+    encoder.fit_tokenizer(processed_reviews, save=False)
+    data = encoder.prepare_data(processed_reviews, labels)
+    vocab_size = min(len(encoder.tokenizer.word_index) + 1, 10000)
+
+    lengths = sequence_lengths(data[0])
+    print(f"\nTraining rows: {len(lengths)}, length p50 {np.percentile(lengths, 50):.0f}, "
+          f"p90 {np.percentile(lengths, 90):.0f}, padded to {data[0].shape[1]}")
+
+    results = {}
+    for name, bucketed in [('padded', False), ('bucketed', True)]:
+        print(f"Training {args.model} on {name} input for {args.epochs} epochs...")
+        results[name] = run(MODELS[args.model], data, vocab_size, args, bucketed)
+
+    print(f"\n{args.model}, batch size {args.batch_size}, {args.epochs} epochs")
+    print(f"{'input':>10} {'epoch 1 s':>10} {'epoch s':>10} {'val acc':>10} {'test acc':>10}")
+    for name, result in results.items():
+        print(f"{name:>10} {result['first_epoch_s']:>10.1f} {result['epoch_s']:>10.1f} "
+              f"{result['val_accuracy']:>10.4f} {result['test_accuracy']:>10.4f}")
+    print(f"Epoch time speedup: {results['padded']['epoch_s'] / results['bucketed']['epoch_s']:.1f}x, "
+          f"test accuracy delta: "
+          f"{results['bucketed']['test_accuracy'] - results['padded']['test_accuracy']:+.4f}")
+
+
+if __name__ == "__main__":
+    main()
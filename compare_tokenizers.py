@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# parity report: fast whitespace tokenizer vs NLTK word_tokenize
+
+import sys
+import os
+import json
+import time
+import argparse
+from collections import Counter
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from preprocessing import load_labelled_reviews, TextPreprocessor, remove_outliers
+
+
+def preprocess_with(tokenizer, reviews):
+    preprocessor = TextPreprocessor(tokenizer=tokenizer)
+    start = time.time()
+    processed = preprocessor.preprocess_reviews(reviews)
+    return processed, time.time() - start
+
+
+def compare_vocabulary(nltk_reviews, fast_reviews):
+    nltk_counts = Counter(word for review in nltk_reviews for word in review.split())
+    fast_counts = Counter(word for review in fast_reviews for word in review.split())
+
+    shared = set(nltk_counts) & set(fast_counts)
+    only_nltk = Counter({w: c for w, c in nltk_counts.items() if w not in fast_counts})
+    only_fast = Counter({w: c for w, c in fast_counts.items() if w not in nltk_counts})
+    differing = sum(1 for a, b in zip(nltk_reviews, fast_reviews) if a != b)
+
+    return {
+        "nltk_vocab_size": len(nltk_counts),
+        "fast_vocab_size": len(fast_counts),
+        "shared_vocab": len(shared),
+        "jaccard": len(shared) / len(set(nltk_counts) | set(fast_counts)),
+        "nltk_tokens": sum(nltk_counts.values()),
+        "fast_tokens": sum(fast_counts.values()),
+        "reviews_differing": differing,
+        "top_only_nltk": only_nltk.most_common(10),
+        "top_only_fast": only_fast.most_common(10),
+    }
+
+
+def compare_accuracy(processed_by_tokenizer, labels, epochs):
+    import tensorflow as tf
+    from feature_engineering import TextEncoder
+    from model import create_cnn_model
+
+    results = {}
+    for name, processed in processed_by_tokenizer.items():
+        reviews, kept_labels = remove_outliers(processed, labels)
+
+        encoder = TextEncoder(max_words=10000, max_len=200)
+        # keep the deployed tokenizer artifact untouched
+        encoder.fit_tokenizer(reviews, save=False)
+        X_train, X_val, X_test, y_train, y_val, y_test = encoder.prepare_data(
+            reviews, kept_labels
+        )
+
+        tf.keras.utils.set_random_seed(42)
+        vocab_size = min(len(encoder.tokenizer.word_index) + 1, 10000)
+        model = create_cnn_model(vocab_size, 200)
+        model.fit(X_train, y_train, batch_size=32, epochs=epochs,
+                  validation_data=(X_val, y_val), verbose=2)
+
+        test_loss, test_acc, test_auc = model.evaluate(X_test, y_test, verbose=0)
+        results[name] = {"test_accuracy": test_acc, "test_auc": test_auc}
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--train", action="store_true",
+                        help="also train a CNN on each and compare test accuracy")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--output", default="artifacts/tokenizer_parity.json")
+    args = parser.parse_args()
+
+    reviews, labels = load_labelled_reviews()
+
+    print("\nPreprocessing with the NLTK tokenizer...")
+    nltk_reviews, nltk_time = preprocess_with("nltk", reviews)
+    print("\nPreprocessing with the fast tokenizer...")
+    fast_reviews, fast_time = preprocess_with("fast", reviews)
+
+    report = {"nltk_seconds": nltk_time, "fast_seconds": fast_time}
+    report.update(compare_vocabulary(nltk_reviews, fast_reviews))
+
+    if args.train:
+        report["accuracy"] = compare_accuracy(
+            {"nltk": nltk_reviews, "fast": fast_reviews}, labels, args.epochs
+        )
+
+    print("\nTokenizer parity report")
+    print("-" * 40)
+    print(f"Preprocessing time: nltk {nltk_time:.1f}s, fast {fast_time:.1f}s")
+    print(f"Vocabulary: nltk {report['nltk_vocab_size']}, fast {report['fast_vocab_size']}, "
+          f"shared {report['shared_vocab']} (Jaccard {report['jaccard']:.4f})")
+    print(f"Tokens: nltk {report['nltk_tokens']}, fast {report['fast_tokens']}")
+    print(f"Reviews with any difference: {report['reviews_differing']}/{len(reviews)}")
+    print(f"Most common only in nltk: {report['top_only_nltk']}")
+    print(f"Most common only in fast: {report['top_only_fast']}")
+    for name, scores in report.get("accuracy", {}).items():
+        print(f"{name}: test accuracy {scores['test_accuracy']:.4f}, AUC {scores['test_auc']:.4f}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
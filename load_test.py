@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# load generator for app.py / serve_async.py
+#
+#   python load_test.py --port 8000 --concurrency 16 --requests 400 --slow-clients 8
+#
+# Sends real review texts from --concurrency clients and reports throughput
+# and latency percentiles. Use a different --offset for each run against the
+# same server, otherwise the prediction cache answers.
+# --slow-clients adds connections that trickle their request body a few
+# bytes at a time, the way a client on a bad mobile link would.
+
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from preprocessing import load_labelled_reviews
+
+
+async def post(host, port, path, payload, trickle_delay=0.0):
+    body = json.dumps(payload).encode()
+    head = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n").encode()
+
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(head)
+        if trickle_delay:
+            for i in range(0, len(body), 16):
+                writer.write(body[i:i + 16])
+                await writer.drain()
+                await asyncio.sleep(trickle_delay)
+        else:
+            writer.write(body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def client(args, texts, latencies, errors):
+    while texts:
+        text = texts.pop()
+        start = time.perf_counter()
+        try:
+            status = await post(args.host, args.port, '/predict', {'text': text})
+        except OSError:
+            status = None
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(status)
+
+
+async def slow_client(args, stop):
+    while not stop.is_set():
+        try:
+            await post(args.host, args.port, '/predict', {'text': 'slow client ' * 20},
+                       trickle_delay=args.trickle_delay)
+        except OSError:
+            await asyncio.sleep(args.trickle_delay)
+
+
+async def run(args):
+    reviews, labels = load_labelled_reviews(raw=True)
+    texts = [review[:2000] for review in reviews[args.offset:args.offset + args.requests]]
+
+    stop = asyncio.Event()
+    slow = [asyncio.create_task(slow_client(args, stop)) for _ in range(args.slow_clients)]
+    # let the slow connections open before measuring
+    await asyncio.sleep(0.5 if slow else 0)
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(args, texts, latencies, errors)
+                           for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    latencies = np.array(latencies) * 1000
+    print(f"\n{args.host}:{args.port}  concurrency {args.concurrency}, "
+          f"{args.slow_clients} slow clients")
+    print(f"Requests: {len(latencies)} ok, {len(errors)} failed in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:.1f} req/s)")
+    if len(latencies):
+        print(f"Latency: p50 {np.percentile(latencies, 50):.1f} ms, "
+              f"p90 {np.percentile(latencies, 90):.1f} ms, "
+              f"p99 {np.percentile(latencies, 99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the sentiment web app')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--offset', type=int, default=0,
+                        help='index of the first review to send')
+    parser.add_argument('--slow-clients', type=int, default=0)
+    parser.add_argument('--trickle-delay', type=float, default=0.2,
+                        help='seconds between 16-byte writes for slow clients')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
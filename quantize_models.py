@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# write int8 and float16 .tflite exports of the trained models
+#
+#   python quantize_models.py                 every models/best_<name>.h5
+#   python quantize_models.py --model cnn
+#   python quantize_models.py --rebuild       re-encode the test split
+#
+# Training already does this for the model it trains; this rebuilds the
+# exports and accuracy reports for checkpoints that are already on disk.
+
+import sys
+import os
+import argparse
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from feature_engineering import load_vocabulary
+from evaluation import load_test_split
+from quantization import export_quantized
+from serving import discover_models
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export quantized versions of the trained models')
+    parser.add_argument('--model', action='append',
+                        help='model name, e.g. lstm (default: every best_<name>.h5)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='encode the cached corpus with the saved vocabulary again')
+    args = parser.parse_args()
+
+    models = {name: path for name, path in discover_models('models').items()
+              if path.endswith('.h5') and (not args.model or name in args.model)}
+    if not models:
+        print("No matching models in models/, train a model first")
+        return
+
+    # the saved test split the models were evaluated on
+    vocab = load_vocabulary()
+    if vocab is None:
+        print("No saved vocabulary found, train a model first")
+        return
+    X_test, y_test = load_test_split(vocab, rebuild=args.rebuild)
+
+    for name, path in models.items():
+        export_quantized(path, vocab, X_test, y_test)
+
+
+if __name__ == "__main__":
+    main()
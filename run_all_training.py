@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# train several architectures on one preprocessing pass
+#
+#   python run_all_training.py                           lstm, cnn and hybrid
+#   python run_all_training.py --models cnn hybrid --epochs 10 --bucketed
+#   python run_all_training.py --parallel                one process per model
+#   python run_all_training.py --from-encoded            reuse artifacts/encoded/
+
+import sys
+import os
+import argparse
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from train import train_models, MODEL_BUILDERS, DEFAULT_TRAINING_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train and compare the sentiment models')
+    parser.add_argument('--models', nargs='+', choices=sorted(MODEL_BUILDERS),
+                        default=list(MODEL_BUILDERS))
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_TRAINING_CONFIG['batch_size'])
+    parser.add_argument('--epochs', type=int, default=DEFAULT_TRAINING_CONFIG['epochs'])
+    parser.add_argument('--patience', type=int, default=DEFAULT_TRAINING_CONFIG['early_stopping_patience'],
+                        help='epochs without val_loss improvement before stopping')
+    parser.add_argument('--bucketed', action='store_true',
+                        help='feed length-bucketed tf.data batches instead of padded arrays')
+    parser.add_argument('--parallel', action='store_true',
+                        help='train each model in its own process at the same time')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='processes for --parallel (default: one per model)')
+    parser.add_argument('--from-encoded', action='store_true',
+                        help='train on the split saved in artifacts/encoded/ by an earlier run')
+    parser.add_argument('--quantize', action='store_true',
+                        help='also write int8/float16 .tflite exports (minutes per model)')
+    parser.add_argument('--no-plots', action='store_true',
+                        help='skip history plots and confusion matrices')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print(f"Training: {', '.join(args.models)}")
+    print("=" * 50)
+
+    train_models(args.models, {
+        'batch_size': args.batch_size,
+        'epochs': args.epochs,
+        'early_stopping_patience': args.patience,
+        'bucketed': args.bucketed,
+        'from_encoded': args.from_encoded,
+        'quantize': args.quantize,
+        'plots': not args.no_plots,
+    }, parallel=args.parallel, n_jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    main()
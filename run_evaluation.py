@@ -1,46 +1,49 @@
 #!/usr/bin/env python3
 # run evaluation only
+#
+#   python run_evaluation.py                              models/best_hybrid.h5
+#   python run_evaluation.py --model models/best_cnn.h5
+#   python run_evaluation.py --rebuild                    re-encode the test split
+#
+# The model is scored with the saved vocabulary (artifacts/vocab.bin) on
+# the test split saved in artifacts/encoded/; nothing is refitted.
 
 import sys
 import os
-import tensorflow as tf
+import argparse
 
 # add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from preprocessing import load_labelled_reviews, TextPreprocessor, remove_outliers
-from feature_engineering import TextEncoder
-from evaluation import evaluate_model
+from feature_engineering import TextEncoder, load_vocabulary, check_model_vocabulary
+from evaluation import evaluate_model, load_test_split
+from model import load_saved_model
 
-def run_evaluation():
+def run_evaluation(model_path='models/best_hybrid.h5', rebuild=False):
     print("=" * 50)
     print("Model Evaluation Script")
     print("=" * 50)
     
-    # Load and preprocess data
-    print("\nLoading data...")
-    reviews, labels = load_labelled_reviews()
-    
-    preprocessor = TextPreprocessor()
-    processed_reviews = preprocessor.preprocess_reviews(reviews)
-    processed_reviews, labels = remove_outliers(processed_reviews, labels)
-    
-    # Encode text
-    encoder = TextEncoder(max_words=10000, max_len=200)
-    encoder.fit_tokenizer(processed_reviews)
-    X_train, X_val, X_test, y_train, y_val, y_test = encoder.prepare_data(
-        processed_reviews, labels
-    )
-    
-    # Load trained model
-    model_path = 'models/best_hybrid.h5'  # or best_lstm.h5, best_cnn.h5
     if not os.path.exists(model_path):
         print(f"Model not found: {model_path}")
         print("Please train a model first using run_training.py")
         return
     
+    # the vocabulary the deployed models were trained with
+    vocab = load_vocabulary()
+    if vocab is None:
+        print("No saved vocabulary found")
+        print("Please train a model first using run_training.py")
+        return
+    check_model_vocabulary(model_path, vocab)
+    encoder = TextEncoder(max_words=vocab.max_words, max_len=vocab.max_len)
+    encoder.vocab = vocab
+    
+    print("\nLoading test split...")
+    X_test, y_test = load_test_split(vocab, rebuild=rebuild)
+    
     print(f"\nLoading model: {model_path}")
-    model = tf.keras.models.load_model(model_path)
+    model = load_saved_model(model_path)
     
     # Run evaluation - this will generate confusion_matrix.png
     print("\nRunning evaluation...")
@@ -51,7 +54,14 @@ def run_evaluation():
     print("- confusion_matrix.png")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Evaluate a trained model on the saved test split')
+    parser.add_argument('--model', default='models/best_hybrid.h5',
+                        help='checkpoint to evaluate (best_lstm.h5, best_cnn.h5, best_hybrid.h5)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='encode the cached corpus with the saved vocabulary again')
+    args = parser.parse_args()
+
     try:
-        run_evaluation()
+        run_evaluation(args.model, args.rebuild)
     except Exception as e:
         print(f"\nError during evaluation: {e}")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# hyperparameter sweep over one architecture, pruning weak trials early
+#
+#   python run_sweep.py --model cnn --trials 30
+#   python run_sweep.py --model lstm --trials 20 --max-epochs 9 --eta 3 --jobs 4
+#
+# Rerunning with the same --name resumes the sweep from sweeps/<name>.sqlite.
+
+import sys
+import os
+import argparse
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from sweep import run_sweep, SEARCH_SPACES
+from train import prepare_training_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search hyperparameters for one sentiment model')
+    parser.add_argument('--model', choices=sorted(SEARCH_SPACES), default='cnn')
+    parser.add_argument('--trials', type=int, default=20, help='total trials in the sweep')
+    parser.add_argument('--min-epochs', type=int, default=1, help='epochs before the first rung')
+    parser.add_argument('--max-epochs', type=int, default=9, help='epochs for a trial never pruned')
+    parser.add_argument('--eta', type=int, default=3,
+                        help='keep the best 1/eta of the trials at every rung')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='trials trained at the same time (default: one per core)')
+    parser.add_argument('--name', default=None, help='sweep name (default: <model>_sweep)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--from-encoded', action='store_true',
+                        help='use the split saved in artifacts/encoded/ by a training run')
+    args = parser.parse_args()
+
+    data = prepare_training_data({'from_encoded': True}) if args.from_encoded else None
+
+    run_sweep(args.model, n_trials=args.trials, max_epochs=args.max_epochs,
+              min_epochs=args.min_epochs, eta=args.eta, n_jobs=args.jobs,
+              name=args.name, seed=args.seed, data=data)
+
+
+if __name__ == "__main__":
+    main()
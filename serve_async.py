@@ -0,0 +1,352 @@
+# serve_async.py
+# ASGI serving mode: connections are handled on an event loop, preprocessing
+# runs on a process pool and every forward pass on one inference thread.
+#
+#   python serve_async.py            (or: uvicorn serve_async:app)
+
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from preprocessing import (
+    TextPreprocessor, LemmaCache, get_lemma_table_path, preprocess_chunk, resolve_n_jobs
+)
+from serving import (
+    ModelRegistry, UnknownModelError, MicroBatcher, PredictionCache, get_length_buckets,
+    load_inference_model, label_prediction, read_batch_texts, predict_cached,
+    iter_ndjson_lines, ndjson_answers, chunked
+)
+
+DEFAULT_MODEL = os.environ.get('SENTIMENT_DEFAULT_MODEL', 'hybrid')
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
+# same knobs as app.py
+BATCH_MAX_SIZE = int(os.environ.get('SENTIMENT_BATCH_MAX_SIZE', 32))
+BATCH_MAX_WAIT_MS = float(os.environ.get('SENTIMENT_BATCH_MAX_WAIT_MS', 5))
+MAX_PAYLOAD_BYTES = int(os.environ.get('SENTIMENT_MAX_PAYLOAD_BYTES', 8 * 1024 * 1024))
+MAX_BATCH_TEXTS = int(os.environ.get('SENTIMENT_MAX_BATCH_TEXTS', 1000))
+CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE', 10000))
+CACHE_TTL_S = float(os.environ.get('SENTIMENT_CACHE_TTL_S', 3600))
+# -1 uses every core
+PREPROCESS_WORKERS = int(os.environ.get('SENTIMENT_PREPROCESS_WORKERS', -1))
+
+
+class PayloadTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class ServingState:
+    """Model registry and executors, built once at startup."""
+
+    def __init__(self, default_model=DEFAULT_MODEL, preprocess_workers=PREPROCESS_WORKERS):
+        # the registry imports TensorFlow only when it loads a model, so
+        # spawned preprocessing workers re-importing this module stay light
+        self.registry = ModelRegistry('models', default=default_model,
+                                      load_model=partial(load_inference_model, buckets=get_length_buckets()))
+
+        print("Loading model...")
+        self.registry.get()
+
+        lemma_cache = None
+        if os.path.exists(get_lemma_table_path()):
+            lemma_cache = LemmaCache.load()
+        preprocessor = TextPreprocessor(lemma_cache=lemma_cache)
+
+        # spawn rather than fork: this process already runs TensorFlow threads
+        self.preprocess_workers = resolve_n_jobs(preprocess_workers)
+        print(f"Starting {self.preprocess_workers} preprocessing processes...")
+        self.preprocess_pool = preprocessor.create_pool(
+            self.preprocess_workers, mp_context=multiprocessing.get_context('spawn'))
+
+        # all forward passes run on this one thread, in arrival order
+        self.inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self.batcher = MicroBatcher(
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            executor=self.inference_executor,
+        )
+        # keyed on (model version, preprocessed text), as in app.py
+        self.prediction_cache = PredictionCache(CACHE_SIZE, CACHE_TTL_S)
+
+    async def get_model(self, name):
+        # a first use or hot swap loads a checkpoint, keep that off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.registry.get, name)
+
+    def warm_up(self):
+        # start every worker and load its NLTK data before the first request
+        futures = [self.preprocess_pool.submit(preprocess_chunk, ["warm up reviews"])
+                   for _ in range(self.preprocess_workers)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.batcher.close()
+        self.inference_executor.shutdown()
+        self.preprocess_pool.shutdown()
+
+    async def preprocess(self, texts):
+        loop = asyncio.get_running_loop()
+        processed, _, _ = await loop.run_in_executor(self.preprocess_pool, preprocess_chunk, texts)
+        return processed
+
+    async def predict(self, text, served):
+        processed = (await self.preprocess([text]))[0]
+
+        prediction = self.prediction_cache.get((served.version, processed))
+        if prediction is None:
+            padded = served.encode([processed])
+            future = self.batcher.submit(padded[0], predict_fn=served.predict)
+            prediction = float(await asyncio.wrap_future(future))
+            self.prediction_cache.put((served.version, processed), prediction)
+        return label_prediction(prediction)
+
+    async def predict_many(self, texts, served):
+        # the same cache logic as app.py; it blocks on the preprocessing pool
+        # and the inference thread, so it waits on a thread of its own
+        def preprocess(texts):
+            return self.preprocess_pool.submit(preprocess_chunk, texts).result()[0]
+
+        def predict(misses):
+            return self.inference_executor.submit(served.predict, served.encode(misses)).result()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(
+            predict_cached, texts, served.version, self.prediction_cache, preprocess, predict))
+
+    def metrics(self):
+        return {
+            'models': self.registry.stats(),
+            'batcher': self.batcher.stats(),
+            'prediction_cache': self.prediction_cache.stats()
+        }
+
+
+state = None
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        body += message.get('body', b'')
+        if len(body) > MAX_PAYLOAD_BYTES:
+            raise PayloadTooLarge()
+        if not message.get('more_body', False):
+            return bytes(body)
+
+
+async def iter_body_lines(receive):
+    """Yield the complete lines of each body chunk as it arrives.
+
+    Only the unfinished last line is held between chunks, and it may not
+    grow past MAX_PAYLOAD_BYTES.
+    """
+    pending = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        pending += message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if more_body:
+            *lines, pending = pending.split(b'\n')
+            if len(pending) > MAX_PAYLOAD_BYTES:
+                raise PayloadTooLarge()
+        else:
+            lines, pending = pending.split(b'\n'), b''
+        if lines:
+            yield lines
+        if not more_body:
+            return
+
+
+async def send_response(send, status, body, content_type='application/json'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()),
+                    (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200):
+    await send_response(send, status, json.dumps(payload).encode())
+
+
+def query_model(scope):
+    # ?model=cnn picks models/best_cnn.h5, otherwise the default model
+    values = parse_qs(scope.get('query_string', b'').decode()).get('model')
+    return values[0] if values else None
+
+
+async def handle_predict(scope, receive, send):
+    served = await state.get_model(query_model(scope))
+    try:
+        text = json.loads(await read_body(receive))['text']
+
+        if not text:
+            return await send_json(send, {
+                'error': 'No text provided',
+                'success': False
+            })
+
+        sentiment, confidence = await state.predict(text, served)
+        await send_json(send, {
+            'sentiment': sentiment,
+            'confidence': confidence,
+            'success': True
+        })
+
+    except ClientDisconnected:
+        # nobody is left to answer
+        return
+    except PayloadTooLarge:
+        await send_json(send, {'error': 'Payload too large', 'success': False}, 413)
+    except Exception as e:
+        await send_json(send, {
+            'error': str(e),
+            'success': False
+        })
+
+
+async def handle_predict_batch(scope, receive, send):
+    served = await state.get_model(query_model(scope))
+    headers = dict(scope['headers'])
+    if headers.get(b'content-type', b'').split(b';')[0].strip() == b'application/x-ndjson':
+        return await handle_predict_batch_stream(receive, served, send)
+
+    try:
+        body = await read_body(receive)
+    except ClientDisconnected:
+        return
+    except PayloadTooLarge:
+        return await send_json(send, {'error': 'Payload too large', 'success': False}, 413)
+
+    try:
+        texts = read_batch_texts(json.loads(body))
+    except ValueError as e:
+        return await send_json(send, {'error': str(e), 'success': False}, 400)
+
+    if len(texts) > MAX_BATCH_TEXTS:
+        return await send_json(send, {
+            'error': f'At most {MAX_BATCH_TEXTS} texts per request',
+            'success': False
+        }, 413)
+
+    try:
+        results = await state.predict_many(texts, served) if texts else []
+    except Exception as e:
+        return await send_json(send, {'error': str(e), 'success': False})
+
+    await send_json(send, {
+        'results': results,
+        'count': len(results),
+        'success': True
+    })
+
+
+async def handle_predict_batch_stream(receive, served, send):
+    # NDJSON in, NDJSON out: the lines of each body chunk are scored as soon
+    # as it arrives, at most MAX_BATCH_TEXTS lines per forward pass
+    started = False
+
+    async def send_lines(payload):
+        nonlocal started
+        if not started:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [(b'content-type', b'application/x-ndjson')],
+            })
+            started = True
+        await send({'type': 'http.response.body', 'body': payload, 'more_body': True})
+
+    line_number = 1
+    try:
+        async for lines in iter_body_lines(receive):
+            items = list(iter_ndjson_lines(lines, start=line_number))
+            line_number += len(lines)
+            # one answer per line, a malformed one gets an error in its place
+            for chunk in chunked(items, MAX_BATCH_TEXTS):
+                texts = [text for _, text, error in chunk if error is None]
+                results = await state.predict_many(texts, served) if texts else []
+                answers = ndjson_answers(chunk, results)
+                await send_lines(''.join(json.dumps(answer) + '\n' for answer in answers).encode())
+    except ClientDisconnected:
+        return
+    except Exception as e:
+        # earlier lines may have been answered already, so report in-band
+        error = 'Line too long' if isinstance(e, PayloadTooLarge) else str(e)
+        await send_lines((json.dumps({'error': error, 'success': False}) + '\n').encode())
+    if not started:
+        await send_lines(b'')
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def lifespan(receive, send):
+    global state
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                loop = asyncio.get_running_loop()
+                state = await loop.run_in_executor(None, ServingState)
+                await loop.run_in_executor(None, state.warm_up)
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if state is not None:
+                state.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    route = (scope['method'], scope['path'])
+    try:
+        if route == ('GET', '/'):
+            with open(TEMPLATE_PATH, 'rb') as f:
+                await send_response(send, 200, f.read(), 'text/html; charset=utf-8')
+        elif route == ('POST', '/predict'):
+            await handle_predict(scope, receive, send)
+        elif route == ('POST', '/predict/batch'):
+            await handle_predict_batch(scope, receive, send)
+        elif route == ('GET', '/metrics'):
+            await send_json(send, state.metrics())
+        else:
+            await send_json(send, {'error': 'Not found', 'success': False}, 404)
+    except UnknownModelError as e:
+        await send_json(send, {'error': e.args[0], 'success': False}, 404)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("The async server needs uvicorn: pip install uvicorn")
+
+    uvicorn.run(app, host=os.environ.get('SENTIMENT_HOST', '127.0.0.1'),
+                port=int(os.environ.get('SENTIMENT_PORT', 8000)))
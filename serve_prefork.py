@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Prefork serving mode: the parent exports the vocabulary and every
+# models/best_<name>.h5 to artifacts/shared/ once, then forks workers that
+# serve app.py on one listening socket and map those files.
+#
+#   python serve_prefork.py --workers 4             shared weights
+#   python serve_prefork.py --workers 4 --private   every worker loads its own copy
+#
+# The parent never imports TensorFlow, so each worker starts its runtime
+# after the fork. Once all workers are up, the parent prints their memory.
+
+import sys
+import os
+import signal
+import socket
+import argparse
+
+# add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from serving import SharedModelStore, process_memory
+
+
+def run_worker(sock, ready_fd, store_dir):
+    host, port = sock.getsockname()[:2]
+    if store_dir:
+        os.environ['SENTIMENT_SHARED_STORE'] = store_dir
+
+    # imported after the fork: this loads the default model and starts the batcher
+    import app
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app.app, threaded=True, fd=sock.fileno())
+    os.write(ready_fd, b'.')
+    os.close(ready_fd)
+    server.serve_forever()
+
+
+def spawn(sock, store_dir):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(sock, write_fd, store_dir)
+        finally:
+            os._exit(1)
+    os.close(write_fd)
+    return pid, read_fd
+
+
+def wait_ready(workers):
+    for pid, read_fd in workers.items():
+        ready = os.read(read_fd, 1)
+        os.close(read_fd)
+        if not ready:
+            print(f"Worker {pid} exited during startup")
+
+
+def report_memory(pids):
+    columns = ['rss_mb', 'rss_anon_mb', 'rss_file_mb', 'pss_mb']
+    print(f"{'pid':>8} " + ' '.join(f"{column:>12}" for column in columns))
+    totals = dict.fromkeys(columns, 0.0)
+    for pid in pids:
+        memory = process_memory(pid)
+        for column in columns:
+            totals[column] += memory.get(column, 0.0)
+        print(f"{pid:>8} " + ' '.join(f"{memory.get(column, 0.0):>12.1f}" for column in columns))
+    print(f"{'total':>8} " + ' '.join(f"{totals[column]:>12.1f}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve app.py from forked workers')
+    parser.add_argument('--host', default=os.environ.get('SENTIMENT_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SENTIMENT_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--private', action='store_true',
+                        help='load a private copy of the model in every worker')
+    args = parser.parse_args()
+
+    store_dir = None
+    if not args.private:
+        store = SharedModelStore()
+        names = store.export()
+        store_dir = store.directory
+        print(f"Exported vocabulary and {', '.join(names) or 'no models'} to {store_dir}")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    print(f"Starting {args.workers} workers...")
+    workers = dict(spawn(sock, store_dir) for _ in range(args.workers))
+    wait_ready(workers)
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"({'private copies' if args.private else 'shared store'})")
+    report_memory(workers)
+
+    def stop(signum, frame):
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # replace workers that die, e.g. on an out-of-memory kill
+    while True:
+        pid, status = os.wait()
+        if pid not in workers:
+            continue
+        del workers[pid]
+        print(f"Worker {pid} exited with status {status}, restarting")
+        new_pid, read_fd = spawn(sock, store_dir)
+        workers[new_pid] = read_fd
+        wait_ready({new_pid: read_fd})
+
+
+if __name__ == "__main__":
+    main()
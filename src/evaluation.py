@@ -7,9 +7,37 @@ import os
 
 # add parent dir to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from preprocessing import TextPreprocessor
+from preprocessing import TextPreprocessor, load_preprocessed_corpus, remove_outliers
+from feature_engineering import TextEncoder, load_encoded_dataset, save_encoded_dataset
+from serving import as_inference_model
 
-def evaluate_model(model, X_test, y_test, encoder=None):
+def load_test_split(vocab, directory=None, rebuild=False):
+    """The test split encoded with vocab, without fitting a tokenizer.
+
+    Read from the encoded dataset when it was saved with this vocabulary.
+    Otherwise (or with rebuild) the cached corpus is encoded with vocab and
+    split again with the seed training uses, which gives the same test
+    reviews, and the result is saved as the encoded dataset for next time.
+    """
+    dataset = None if rebuild else load_encoded_dataset(directory)
+    if dataset is not None and dataset.vocab.vocab_hash == vocab.vocab_hash:
+        print(f"Loaded {len(dataset.y_test)} test samples from {dataset.directory}")
+        return dataset.X_test, dataset.y_test
+    if dataset is not None:
+        print(f"Encoded dataset in {dataset.directory} was saved with vocabulary "
+              f"{dataset.vocab.vocab_hash}, not {vocab.vocab_hash}; encoding the corpus again")
+
+    processed_reviews, labels = load_preprocessed_corpus()
+    processed_reviews, labels = remove_outliers(processed_reviews, labels)
+    encoder = TextEncoder(max_words=vocab.max_words, max_len=vocab.max_len)
+    encoder.vocab = vocab
+    splits = encoder.prepare_data(processed_reviews, labels)
+    directory = save_encoded_dataset(splits, vocab, directory, encoder.split_settings,
+                                     encoder.split_indices)
+    print(f"Saved encoded dataset to {directory}")
+    return splits[2], splits[5]
+
+def evaluate_model(model, X_test, y_test, encoder=None, filename='confusion_matrix.png'):
     """Evaluate model performance"""
     # make predictions
     y_pred_prob = model.predict(X_test)
@@ -28,10 +56,10 @@ def evaluate_model(model, X_test, y_test, encoder=None):
     plt.title('Confusion Matrix')
     plt.xlabel('Predicted')
     plt.ylabel('Actual')
-    plt.savefig('confusion_matrix.png')
+    plt.savefig(filename)
     plt.show()
     
-    print("Confusion matrix saved to confusion_matrix.png")
+    print(f"Confusion matrix saved to {filename}")
     
     # test custom reviews if encoder provided
     if encoder is not None:
@@ -60,7 +88,7 @@ def test_custom_reviews(model, encoder):
     
     # encode and predict
     encoded = encoder.texts_to_sequences(processed)
-    predictions = model.predict(encoded)
+    predictions = as_inference_model(model, encoder.max_len)(encoded)
     
     print("\nCustom Review Predictions:")
     for review, pred in zip(custom_reviews, predictions):
@@ -78,6 +106,8 @@ def test_on_examples(model, encoder, preprocessor):
         "Absolutely love it! Highly recommend!"
     ]
     
+    inference = as_inference_model(model, encoder.max_len)
+
     print("\nTesting on examples:")
     for review in test_reviews:
         # preprocess
@@ -89,7 +119,7 @@ def test_on_examples(model, encoder, preprocessor):
         encoded = encoder.texts_to_sequences([processed])
         
         # predict
-        pred = model.predict(encoded, verbose=0)[0][0]
+        pred = inference(encoded)[0][0]
         sentiment = "Positive" if pred > 0.5 else "Negative"
         confidence = pred if pred > 0.5 else 1 - pred
         
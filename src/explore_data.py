@@ -1,5 +1,7 @@
 import os
 
+from preprocessing import parse_reviews
+
 DOMAINS = ["books", "dvd", "electronics", "kitchen_&_housewares"]
 
 def get_data_directory():
@@ -10,30 +12,6 @@ def get_data_directory():
     return data_dir
 
 
-def parse_reviews(file_path):
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        data = f.read()
-
-    chunks = data.split("<review>")
-    reviews = []
-
-    for chunk in chunks:
-        chunk = chunk.strip()
-        if not chunk:
-            continue
-
-        if "</review>" in chunk:
-            review_text = chunk.split("</review>")[0]
-        else:
-            review_text = chunk
-
-        review_text = review_text.strip()
-        if review_text:
-            reviews.append(review_text)
-
-    return reviews
-
-
 def load_all_domains(data_dir):
     all_positive = []
     all_negative = []
@@ -1,60 +1,291 @@
 import numpy as np
-from sklearn.model_selection import train_test_split
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
 import pickle
+import hashlib
+import itertools
+import json
 import os
 
 MAX_WORDS = 10000
 MAX_LEN = 200
 
+SPLIT_RANDOM_STATE = 42
+ENCODED_DATASET_VERSION = 1
+ENCODED_SPLITS = ('X_train', 'X_val', 'X_test', 'y_train', 'y_val', 'y_test')
+
+VOCAB_MAGIC = b"SAVOCAB"
+VOCAB_FORMAT_VERSION = 1
+# keras Tokenizer defaults, needed to split text exactly the same way
+KERAS_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+# TensorFlow and scikit-learn are imported where a Tokenizer is fitted or
+# data is split, so serving processes can load a vocabulary before any
+# TensorFlow runtime exists (see the prefork server)
+
+
+def get_artifacts_directory():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(current_dir)
+    return os.path.join(project_dir, 'artifacts')
+
+
+def get_vocab_path():
+    return os.path.join(get_artifacts_directory(), 'vocab.bin')
+
+
+def get_encoded_dataset_directory():
+    return os.path.join(get_artifacts_directory(), 'encoded')
+
+
+class Vocabulary:
+    """The part of a fitted Keras Tokenizer the models actually use.
+
+    Only the top max_words ids are kept, plus the settings needed to turn
+    text into the same ids the Tokenizer would give. The vocab_hash stamps
+    the table so a model can be checked against the vocabulary it was
+    trained with.
+
+    File layout: a "SAVOCAB <version>" line, one JSON header line, then the
+    words in id order (id 1 first), one per line.
+    """
+
+    def __init__(self, words, max_words=MAX_WORDS, max_len=MAX_LEN,
+                 oov_token='<OOV>', filters=KERAS_FILTERS, lower=True, split=' '):
+        self.words = list(words)
+        self.max_words = max_words
+        self.max_len = max_len
+        self.oov_token = oov_token
+        self.filters = filters
+        self.lower = lower
+        self.split = split
+
+        self.word_index = {word: i for i, word in enumerate(self.words, start=1)}
+        self.oov_id = self.word_index.get(oov_token) if oov_token else None
+        self._translate = str.maketrans({c: split for c in filters})
+        self.vocab_hash = self._compute_hash()
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, max_len=MAX_LEN):
+        max_words = tokenizer.num_words
+        ranked = sorted(tokenizer.word_index.items(), key=lambda item: item[1])
+        words = [word for word, i in ranked if not max_words or i < max_words]
+        return cls(words, max_words=max_words, max_len=max_len,
+                   oov_token=tokenizer.oov_token, filters=tokenizer.filters,
+                   lower=tokenizer.lower, split=tokenizer.split)
+
+    def __len__(self):
+        return len(self.words)
+
+    def config(self):
+        return {
+            "max_words": self.max_words,
+            "max_len": self.max_len,
+            "oov_token": self.oov_token,
+            "oov_id": self.oov_id,
+            "filters": self.filters,
+            "lower": self.lower,
+            "split": self.split,
+        }
+
+    def _compute_hash(self):
+        digest = hashlib.sha256()
+        digest.update(f"v{VOCAB_FORMAT_VERSION}".encode())
+        digest.update(json.dumps(self.config(), sort_keys=True).encode())
+        digest.update("\n".join(self.words).encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def split_text(self, text):
+        # same as keras text_to_word_sequence
+        if self.lower:
+            text = text.lower()
+        text = text.translate(self._translate)
+        return [word for word in text.split(self.split) if word]
+
+    def texts_to_sequences(self, texts):
+        word_index = self.word_index
+        oov_id = self.oov_id
+        sequences = []
+        for text in texts:
+            ids = (word_index.get(word, oov_id) for word in self.split_text(text))
+            sequences.append([i for i in ids if i is not None])
+        return sequences
+
+    @property
+    def id_dtype(self):
+        # smallest dtype that holds every id; uint16 covers the default 10k words
+        if self.max_words and self.max_words <= np.iinfo(np.uint16).max + 1:
+            return np.uint16
+        return np.int32
+
+    def encode(self, texts, max_len=None, dtype=None):
+        """Encode texts straight into a zero-padded (n, max_len) id matrix.
+
+        Same result as texts_to_sequences + pad_sequences with
+        padding='post' and truncating='post', without the list of lists:
+        each row is written in place and lookups stop at max_len words.
+        """
+        max_len = max_len or self.max_len
+        encoded = np.zeros((len(texts), max_len), dtype=dtype or self.id_dtype)
+
+        word_index = self.word_index
+        oov_id = self.oov_id
+        for row, text in enumerate(texts):
+            ids = (word_index.get(word, oov_id) for word in self.split_text(text))
+            if oov_id is None:
+                ids = (i for i in ids if i is not None)
+            row_ids = np.fromiter(itertools.islice(ids, max_len), dtype=encoded.dtype)
+            encoded[row, :len(row_ids)] = row_ids
+
+        return encoded
+
+    def save(self, path=None):
+        path = path or get_vocab_path()
+        header = dict(self.config(), version=VOCAB_FORMAT_VERSION,
+                      size=len(self.words), vocab_hash=self.vocab_hash)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(VOCAB_MAGIC + b" %d\n" % VOCAB_FORMAT_VERSION)
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write("\n".join(self.words).encode("utf-8"))
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or get_vocab_path()
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic_line, header_line, body = data.split(b"\n", 2)
+        magic, version = magic_line.split(b" ")
+        if magic != VOCAB_MAGIC or int(version) != VOCAB_FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {VOCAB_FORMAT_VERSION} vocabulary file")
+
+        header = json.loads(header_line)
+        words = body.decode("utf-8").split("\n") if body else []
+        vocab = cls(words, max_words=header["max_words"], max_len=header["max_len"],
+                    oov_token=header["oov_token"], filters=header["filters"],
+                    lower=header["lower"], split=header["split"])
+
+        if len(words) != header["size"] or vocab.vocab_hash != header["vocab_hash"]:
+            raise ValueError(f"Vocabulary file {path} is corrupted")
+        return vocab
+
+
+def get_model_metadata_path(model_path):
+    return os.path.splitext(model_path)[0] + '.meta.json'
+
+
+def write_model_metadata(model_path, vocab):
+    """Record which vocabulary a saved model was trained with."""
+    metadata = {
+        "vocab_hash": vocab.vocab_hash,
+        "vocab_format_version": VOCAB_FORMAT_VERSION,
+        "max_words": vocab.max_words,
+        "max_len": vocab.max_len,
+    }
+    metadata_path = get_model_metadata_path(model_path)
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return metadata_path
+
+
+def check_model_vocabulary(model_path, vocab):
+    """Raise if model_path was trained with a different vocabulary."""
+    metadata_path = get_model_metadata_path(model_path)
+    if not os.path.exists(metadata_path):
+        print(f"Warning: no metadata for {model_path}, cannot verify its vocabulary")
+        return False
+
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+
+    if metadata["vocab_hash"] != vocab.vocab_hash:
+        raise ValueError(
+            f"{model_path} was trained with vocabulary {metadata['vocab_hash']}, "
+            f"but the loaded vocabulary is {vocab.vocab_hash}"
+        )
+    return True
+
+
+def load_vocabulary():
+    """Load artifacts/vocab.bin, converting an old tokenizer.pickle if needed."""
+    vocab_path = get_vocab_path()
+    if os.path.exists(vocab_path):
+        return Vocabulary.load(vocab_path)
+
+    tokenizer = load_tokenizer()
+    if tokenizer is None:
+        return None
+
+    vocab = Vocabulary.from_tokenizer(tokenizer)
+    vocab.save(vocab_path)
+    print(f"Converted tokenizer.pickle to {vocab_path}")
+    return vocab
+
+
 class TextEncoder:
     def __init__(self, max_words=10000, max_len=200):
         self.max_words = max_words
         self.max_len = max_len
         self.tokenizer = None
+        self.vocab = None
+        # set by prepare_data, recorded with the encoded dataset
+        self.split_settings = None
+        self.split_indices = None
         
-    def fit_tokenizer(self, texts):
+    def fit_tokenizer(self, texts, save=True):
+        from tensorflow.keras.preprocessing.text import Tokenizer
+
         self.tokenizer = Tokenizer(num_words=self.max_words, oov_token='<OOV>')
         self.tokenizer.fit_on_texts(texts)
+        # only the truncated word -> id table is kept and saved
+        self.vocab = Vocabulary.from_tokenizer(self.tokenizer, self.max_len)
         
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_dir = os.path.dirname(current_dir)
-        artifacts_dir = os.path.join(project_dir, 'artifacts')
-        
-        if not os.path.exists(artifacts_dir):
-            os.makedirs(artifacts_dir)
-            
-        tokenizer_path = os.path.join(artifacts_dir, 'tokenizer.pickle')
-        with open(tokenizer_path, 'wb') as handle:
-            pickle.dump(self.tokenizer, handle, protocol=pickle.HIGHEST_PROTOCOL)
-            
         print(f"Vocabulary size: {len(self.tokenizer.word_index)}")
-        print(f"Saved tokenizer to {tokenizer_path}")
+        if not save:
+            return
+        
+        vocab_path = self.vocab.save()
+        print(f"Saved vocabulary ({len(self.vocab)} words, {self.vocab.vocab_hash}) to {vocab_path}")
         
     def texts_to_sequences(self, texts):
-        if self.tokenizer is None:
+        if self.vocab is None:
             raise ValueError("Tokenizer not fitted yet!")
             
-        sequences = self.tokenizer.texts_to_sequences(texts)
-        padded = pad_sequences(sequences, maxlen=self.max_len, 
-                              padding='post', truncating='post')
-        return padded
+        # padded and truncated at the end, in a compact dtype (uint16 for 10k words)
+        return self.vocab.encode(texts, self.max_len)
     
-    def prepare_data(self, reviews, labels, test_size=0.2, val_size=0.1):
-        
+    def prepare_data(self, reviews, labels, test_size=0.2, val_size=0.1,
+                     random_state=SPLIT_RANDOM_STATE):
+        from sklearn.model_selection import train_test_split
+
         X = self.texts_to_sequences(reviews)
         y = np.array(labels)
+        # row numbers in reviews go through the same split, so the test set
+        # can be rebuilt later without splitting again
+        rows = np.arange(len(y), dtype=np.int32)
         
-        X_temp, X_test, y_temp, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=42, stratify=y
+        X_temp, X_test, y_temp, y_test, rows_temp, rows_test = train_test_split(
+            X, y, rows, test_size=test_size, random_state=random_state, stratify=y
         )
         
         val_size_adjusted = val_size / (1 - test_size)
         
-        X_train, X_val, y_train, y_val = train_test_split(
-            X_temp, y_temp, test_size=val_size_adjusted, random_state=42, stratify=y_temp
+        X_train, X_val, y_train, y_val, rows_train, rows_val = train_test_split(
+            X_temp, y_temp, rows_temp, test_size=val_size_adjusted,
+            random_state=random_state, stratify=y_temp
         )
+
+        self.split_settings = {
+            "samples": len(y),
+            "test_size": test_size,
+            "val_size": val_size,
+            "random_state": random_state,
+            "stratify": True,
+        }
+        self.split_indices = {"train": rows_train, "val": rows_val, "test": rows_test}
         
         print(f"\nData split:")
         print(f"Training samples: {len(X_train)}")
@@ -64,10 +295,106 @@ class TextEncoder:
         return X_train, X_val, X_test, y_train, y_val, y_test
 
 
+class EncodedDataset:
+    """Encoded splits saved by save_encoded_dataset, opened as read-only memory maps.
+
+    X_train, X_val, X_test, y_train, y_val, y_test and, when they were
+    saved, the row numbers train_index, val_index and test_index are
+    attributes. Pages are only read when touched and are shared by every
+    process mapping the same files.
+    """
+
+    def __init__(self, directory, vocab, manifest, arrays):
+        self.directory = directory
+        self.vocab = vocab
+        self.manifest = manifest
+        self.arrays = arrays
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def splits(self):
+        """The six arrays in the order TextEncoder.prepare_data returns them."""
+        return tuple(self.arrays[name] for name in ENCODED_SPLITS)
+
+
+def save_encoded_dataset(splits, vocab, directory=None, split_settings=None, split_indices=None):
+    """Write encoded splits as .npy files plus a manifest.json.
+
+    splits is the tuple from TextEncoder.prepare_data. Ids are stored in
+    the vocabulary's compact dtype and labels as uint8. The vocabulary is
+    copied next to them, and the manifest records its hash, max_len, the
+    split settings and the shape and dtype of every array. The manifest is
+    replaced last, so an interrupted export never looks complete.
+    """
+    directory = directory or get_encoded_dataset_directory()
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    arrays = dict(zip(ENCODED_SPLITS, splits))
+    for name in ENCODED_SPLITS:
+        dtype = vocab.id_dtype if name.startswith('X') else np.uint8
+        arrays[name] = np.asarray(arrays[name]).astype(dtype, copy=False)
+    for split, rows in (split_indices or {}).items():
+        arrays[f'{split}_index'] = np.asarray(rows, dtype=np.int32)
+
+    for name, array in arrays.items():
+        path = os.path.join(directory, f'{name}.npy')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    vocab.save(os.path.join(directory, 'vocab.bin'))
+
+    manifest = {
+        "version": ENCODED_DATASET_VERSION,
+        "vocab_hash": vocab.vocab_hash,
+        "max_words": vocab.max_words,
+        "max_len": vocab.max_len,
+        "split": split_settings,
+        "arrays": {name: {"shape": list(array.shape), "dtype": array.dtype.str}
+                   for name, array in arrays.items()},
+    }
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return directory
+
+
+def load_encoded_dataset(directory=None, mmap_mode='r'):
+    """Open an export of save_encoded_dataset, or return None if there is none.
+
+    Raises ValueError if the arrays or the vocabulary do not match the
+    manifest.
+    """
+    directory = directory or get_encoded_dataset_directory()
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != ENCODED_DATASET_VERSION:
+        raise ValueError(f"{directory} is not a version {ENCODED_DATASET_VERSION} encoded dataset")
+
+    vocab = Vocabulary.load(os.path.join(directory, 'vocab.bin'))
+    if vocab.vocab_hash != manifest["vocab_hash"]:
+        raise ValueError(f"Vocabulary in {directory} does not match its manifest")
+
+    arrays = {}
+    for name, spec in manifest["arrays"].items():
+        array = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+        if list(array.shape) != spec["shape"] or array.dtype.str != spec["dtype"]:
+            raise ValueError(f"{name}.npy in {directory} does not match its manifest")
+        arrays[name] = array
+    return EncodedDataset(directory, vocab, manifest, arrays)
+
+
 def load_tokenizer():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.dirname(current_dir)
-    tokenizer_path = os.path.join(project_dir, 'artifacts', 'tokenizer.pickle')
+    # legacy pickled Keras Tokenizer, see load_vocabulary for the current format
+    tokenizer_path = os.path.join(get_artifacts_directory(), 'tokenizer.pickle')
     
     if not os.path.exists(tokenizer_path):
         print("No saved tokenizer found")
@@ -1,104 +1,139 @@
 # model.py
 # Neural network models for sentiment analysis
 
+import tensorflow as tf
+from tensorflow.keras import ops
 from tensorflow.keras.models import Sequential, Model
 from tensorflow.keras.layers import (
-    Embedding, LSTM, Dense, Dropout,
+    Layer, Embedding, LSTM, Dense, Dropout,
     Bidirectional, Conv1D, GlobalMaxPooling1D,
     BatchNormalization, Input, concatenate
 )
 from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.saving import register_keras_serializable
 
-def create_lstm_model(vocab_size, max_length):
-    """Create LSTM model"""
+@register_keras_serializable(package='sentiment')
+class PaddingMask(Layer):
+    """True for token ids, False for the 0 ids that pad a row."""
+
+    def call(self, inputs):
+        return ops.not_equal(inputs, 0)
+
+def load_saved_model(path, **kwargs):
+    """tf.keras.models.load_model for checkpoints built here.
+
+    Importing this module registers PaddingMask, which the hybrid model
+    needs to be deserialized.
+    """
+    return tf.keras.models.load_model(path, **kwargs)
+
+def create_lstm_model(vocab_size, max_length, embedding_dim=128, lstm_units=64,
+                      dense_units=64, dropout=0.5, learning_rate=0.001):
+    """Create LSTM model
+    The second LSTM and dense layers have half the units of the first.
+    max_length is unused, the model accepts any length; it is kept so all
+    builders share one signature"""
     
     model = Sequential()
     
-    # embedding layer
-    model.add(Embedding(vocab_size, 128, input_length=max_length))
+    # any sequence length, so serving can run shorter buckets
+    model.add(Input(shape=(None,)))
+    
+    # embedding layer; id 0 is padding and masked out of the LSTMs, so
+    # inputs padded to any length give the same output
+    model.add(Embedding(vocab_size, embedding_dim, mask_zero=True))
     
     # LSTM layers
-    model.add(Bidirectional(LSTM(64, dropout=0.5, return_sequences=True)))
-    model.add(Bidirectional(LSTM(32, dropout=0.5)))
+    model.add(Bidirectional(LSTM(lstm_units, dropout=dropout, return_sequences=True)))
+    model.add(Bidirectional(LSTM(lstm_units // 2, dropout=dropout)))
     
     # dense layers
-    model.add(Dense(64, activation='relu'))
-    model.add(Dropout(0.5))
-    model.add(Dense(32, activation='relu'))
-    model.add(Dropout(0.5))
+    model.add(Dense(dense_units, activation='relu'))
+    model.add(Dropout(dropout))
+    model.add(Dense(dense_units // 2, activation='relu'))
+    model.add(Dropout(dropout))
     
     # output layer
     model.add(Dense(1, activation='sigmoid'))
     
     # compile model
     model.compile(
-        optimizer=Adam(learning_rate=0.001),
+        optimizer=Adam(learning_rate=learning_rate),
         loss='binary_crossentropy',
         metrics=['accuracy', 'AUC']
     )
     
     return model
 
-def create_cnn_model(vocab_size, max_length):
-    """Create CNN model for text classification"""
+def create_cnn_model(vocab_size, max_length, embedding_dim=128, filters=128, kernel_size=5,
+                     dense_units=64, dropout=0.5, learning_rate=0.001):
+    """Create CNN model for text classification
+    max_length is unused, the model accepts any length; it is kept so all
+    builders share one signature"""
     
     model = Sequential()
     
+    # any sequence length, so serving can run shorter buckets
+    model.add(Input(shape=(None,)))
+    
     # embedding
-    model.add(Embedding(vocab_size, 128, input_length=max_length))
+    model.add(Embedding(vocab_size, embedding_dim))
     
     # convolutional layer
-    model.add(Conv1D(128, 5, activation='relu'))
+    model.add(Conv1D(filters, kernel_size, activation='relu'))
     model.add(BatchNormalization())
     model.add(GlobalMaxPooling1D())
     
     # dense layers
-    model.add(Dense(64, activation='relu'))
-    model.add(Dropout(0.5))
-    model.add(Dense(32, activation='relu'))
-    model.add(Dropout(0.5))
+    model.add(Dense(dense_units, activation='relu'))
+    model.add(Dropout(dropout))
+    model.add(Dense(dense_units // 2, activation='relu'))
+    model.add(Dropout(dropout))
     
     # output
     model.add(Dense(1, activation='sigmoid'))
     
     model.compile(
-        optimizer=Adam(learning_rate=0.001),
+        optimizer=Adam(learning_rate=learning_rate),
         loss='binary_crossentropy',
         metrics=['accuracy', 'AUC']
     )
     
     return model
 
-def create_hybrid_model(vocab_size, max_length):
+def create_hybrid_model(vocab_size, max_length, embedding_dim=128, filters=64, kernel_size=5,
+                        lstm_units=32, dense_units=64, dropout=0.5, learning_rate=0.001):
     """Create hybrid CNN-LSTM model
-    This combines both CNN and LSTM for better performance"""
+    This combines both CNN and LSTM for better performance.
+    max_length is unused, the model accepts any length; it is kept so all
+    builders share one signature"""
     
-    # input layer
-    inputs = Input(shape=(max_length,))
+    # input layer; any sequence length, so serving can run shorter buckets
+    inputs = Input(shape=(None,))
     
-    # shared embedding
-    embedding = Embedding(vocab_size, 128)(inputs)
+    # shared embedding, unmasked: Conv1D cannot use a mask
+    embedding = Embedding(vocab_size, embedding_dim)(inputs)
     
     # CNN branch
-    conv = Conv1D(64, 5, activation='relu')(embedding)
+    conv = Conv1D(filters, kernel_size, activation='relu')(embedding)
     conv = GlobalMaxPooling1D()(conv)
     
-    # LSTM branch  
-    lstm = Bidirectional(LSTM(32, dropout=0.5))(embedding)
+    # LSTM branch, masked explicitly so it skips the padding
+    lstm = Bidirectional(LSTM(lstm_units, dropout=dropout))(embedding, mask=PaddingMask()(inputs))
     
     # merge both branches
     merged = concatenate([conv, lstm])
     
     # dense layers
-    dense = Dense(64, activation='relu')(merged)
-    dense = Dropout(0.5)(dense)
+    dense = Dense(dense_units, activation='relu')(merged)
+    dense = Dropout(dropout)(dense)
     outputs = Dense(1, activation='sigmoid')(dense)
     
     # create model
     model = Model(inputs=inputs, outputs=outputs)
     
     model.compile(
-        optimizer=Adam(learning_rate=0.001),
+        optimizer=Adam(learning_rate=learning_rate),
         loss='binary_crossentropy',
         metrics=['accuracy', 'AUC']
     )
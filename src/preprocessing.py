@@ -1,28 +1,64 @@
 import os
-import nltk
-import ssl
+import re
+import json
+import hashlib
+import threading
+from collections import namedtuple, OrderedDict
 
-# ssl fix for mac
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
+# nltk, numpy and pandas are imported on first use, not at import time,
+# so importing this module stays cheap and has no side effects
 
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-nltk_data_dir = os.path.join(project_root, "nltk_data")
-nltk.data.path.append(nltk_data_dir)
 
-import pathlib
-home = str(pathlib.Path.home())
-nltk.data.path.append(os.path.join(home, 'nltk_data'))
+def get_nltk_data_directories():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    home = os.path.expanduser("~")
+    return [os.path.join(project_root, "nltk_data"), os.path.join(home, "nltk_data")]
+
+
+_nltk_configured = False
+
+
+def _nltk():
+    """Import NLTK and add our nltk_data folders to its search path once."""
+    global _nltk_configured
+    import nltk
+
+    if not _nltk_configured:
+        for data_dir in get_nltk_data_directories():
+            if data_dir not in nltk.data.path:
+                nltk.data.path.append(data_dir)
+        _nltk_configured = True
+
+    return nltk
+
+
+_stop_words = None
+_lemmatizer = None
+
+
+def load_stop_words():
+    global _stop_words
+    if _stop_words is None:
+        _nltk()
+        from nltk.corpus import stopwords
+        _stop_words = frozenset(stopwords.words("english"))
+    return _stop_words
+
+
+def get_lemmatizer():
+    global _lemmatizer
+    if _lemmatizer is None:
+        _nltk()
+        from nltk.stem import WordNetLemmatizer
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer
+
+
+def nltk_word_tokenize(text):
+    _nltk()
+    from nltk.tokenize import word_tokenize
+    return word_tokenize(text)
 
-import re
-import pandas as pd
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from nltk.tokenize import word_tokenize
 
 DOMAINS = ["books", "dvd", "electronics", "kitchen_&_housewares"]
 
@@ -35,37 +71,117 @@ def get_data_directory():
     return data_dir
 
 
-def parse_reviews(file_path):
+REVIEW_OPEN = "<review>"
+REVIEW_CLOSE = "</review>"
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def _review_body(chunk):
+    # everything up to the closing tag, same rules the old split() parser used
+    return chunk.split(REVIEW_CLOSE, 1)[0].strip()
+
+
+def iter_reviews(file_path, block_size=READ_BLOCK_SIZE):
+    """Yield reviews one at a time, reading the file in fixed-size blocks.
+
+    Only the review currently being assembled is kept in memory, so memory
+    stays flat no matter how large the .review file is.
+    """
     with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        data = f.read()
+        buffer = ""
+        scan_from = 0
 
-    chunks = data.split("<review>")
-    reviews = []
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
 
-    for chunk in chunks:
-        chunk = chunk.strip()
-        if not chunk:
-            continue
+            buffer += block
+            start = 0
 
-        if "</review>" in chunk:
-            review_text = chunk.split("</review>")[0]
-        else:
-            review_text = chunk
+            while True:
+                idx = buffer.find(REVIEW_OPEN, scan_from)
+                if idx == -1:
+                    break
+
+                review_text = _review_body(buffer[start:idx])
+                if review_text:
+                    yield review_text
+
+                start = idx + len(REVIEW_OPEN)
+                scan_from = start
 
-        review_text = review_text.strip()
+            buffer = buffer[start:]
+            # a tag may be split across two blocks, so rescan its possible start
+            scan_from = max(0, len(buffer) - len(REVIEW_OPEN) + 1)
+
+        review_text = _review_body(buffer)
         if review_text:
-            reviews.append(review_text)
+            yield review_text
 
-    return reviews
 
+def parse_reviews(file_path):
+    return list(iter_reviews(file_path))
 
-def load_labelled_reviews():
-    data_dir = get_data_directory()
 
-    reviews = []
-    labels = []
+RECORD_FIELDS = ("title", "review_text", "rating", "helpful", "product_type", "date", "asin")
+TEXT_FIELDS = ("title", "review_text")
 
-    print("Loading labelled data from all domains...")
+# every field sits on its own lines: <tag>\n value \n</tag>
+FIELD_PATTERN = re.compile(r"^<([a-z_]+)>$(.*?)^</\1>$", re.MULTILINE | re.DOTALL)
+
+ReviewRecord = namedtuple("ReviewRecord", RECORD_FIELDS)
+
+
+def _parse_rating(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_helpful(value):
+    # "34 of 41" -> (34, 41)
+    parts = (value or "").split(" of ")
+    if len(parts) != 2:
+        return None
+    try:
+        return int(parts[0]), int(parts[1])
+    except ValueError:
+        return None
+
+
+def parse_review_record(review):
+    """Pull the fields we use out of one <review> block in a single scan."""
+    fields = {}
+    for match in FIELD_PATTERN.finditer(review):
+        name = match.group(1)
+        if name in RECORD_FIELDS and name not in fields:
+            fields[name] = match.group(2).strip()
+
+    return ReviewRecord(
+        title=fields.get("title", ""),
+        review_text=fields.get("review_text", ""),
+        rating=_parse_rating(fields.get("rating")),
+        helpful=_parse_helpful(fields.get("helpful")),
+        product_type=fields.get("product_type", ""),
+        date=fields.get("date", ""),
+        asin=fields.get("asin", ""),
+    )
+
+
+def iter_review_records(file_path, block_size=READ_BLOCK_SIZE):
+    for review in iter_reviews(file_path, block_size):
+        yield parse_review_record(review)
+
+
+def record_text(record):
+    # only the free-text fields go through cleaning, tokenizing and encoding
+    return "\n".join(getattr(record, field) for field in TEXT_FIELDS)
+
+
+def iter_domain_files():
+    data_dir = get_data_directory()
 
     for domain in DOMAINS:
         domain_path = os.path.join(data_dir, domain)
@@ -76,67 +192,549 @@ def load_labelled_reviews():
             print(f"   Warning: Domain '{domain}' was skipped: review files not found.")
             continue
 
-        pos_reviews = parse_reviews(pos_file)
-        neg_reviews = parse_reviews(neg_file)
+        yield domain, pos_file, neg_file
+
 
-        reviews.extend(pos_reviews)
-        labels.extend([1] * len(pos_reviews))
+def iter_labelled_reviews(raw=False, with_domain=False):
+    """Lazily yield (review, label) pairs from all domains.
 
-        reviews.extend(neg_reviews)
-        labels.extend([0] * len(neg_reviews))
+    Reviews are the title and review text only; pass raw=True to get the
+    whole <review> block including metadata. with_domain=True yields
+    (domain, review, label) instead.
+    """
+    for domain, pos_file, neg_file in iter_domain_files():
+        for file_path, label in [(pos_file, 1), (neg_file, 0)]:
+            for review in iter_reviews(file_path):
+                if not raw:
+                    review = record_text(parse_review_record(review))
+                yield (domain, review, label) if with_domain else (review, label)
+
+
+def load_labelled_reviews(raw=False):
+    reviews = []
+    labels = []
+    counts = {}
 
+    print("Loading labelled data from all domains...")
+
+    for domain, review, label in iter_labelled_reviews(raw, with_domain=True):
+        reviews.append(review)
+        labels.append(label)
+        domain_counts = counts.setdefault(domain, {1: 0, 0: 0})
+        domain_counts[label] += 1
+
+    for domain, domain_counts in counts.items():
         print(
             f"   Domain '{domain}': "
-            f"{len(pos_reviews)} positive, {len(neg_reviews)} negative"
+            f"{domain_counts[1]} positive, {domain_counts[0]} negative"
         )
 
     print(f"Loaded {len(reviews)} labelled reviews in total.")
     return reviews, labels
 
 
+def load_review_records():
+    """Load every review as a DataFrame with typed metadata columns.
+
+    Handy for per-domain and per-rating analysis; the text columns can be
+    fed to TextPreprocessor through record_text.
+    """
+    rows = []
+    for domain, pos_file, neg_file in iter_domain_files():
+        for file_path, label in [(pos_file, 1), (neg_file, 0)]:
+            for record in iter_review_records(file_path):
+                helpful = record.helpful or (None, None)
+                rows.append({
+                    "domain": domain,
+                    "label": label,
+                    "title": record.title,
+                    "review_text": record.review_text,
+                    "rating": record.rating,
+                    "helpful_votes": helpful[0],
+                    "helpful_total": helpful[1],
+                    "product_type": record.product_type,
+                    "date": record.date,
+                    "asin": record.asin,
+                })
+
+    import pandas as pd
+
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+
+    df["label"] = df["label"].astype("int8")
+    df["rating"] = df["rating"].astype("float32")
+    df["helpful_votes"] = df["helpful_votes"].astype("Int32")
+    df["helpful_total"] = df["helpful_total"].astype("Int32")
+    df["domain"] = df["domain"].astype("category")
+    df["product_type"] = df["product_type"].astype("category")
+    df["date"] = pd.to_datetime(df["date"], format="%B %d, %Y", errors="coerce")
+    return df
+
+
+HTML_TAG_PATTERN = r"<.*?>"
+URL_PATTERN = r"http\S+|www\.\S+"
+EMAIL_PATTERN = r"\S+@\S+"
+PUNCTUATION_PATTERN = r"[^\w\s]"
+DIGIT_PATTERN = r"\d+"
+
+HTML_TAG_RE = re.compile(HTML_TAG_PATTERN)
+URL_RE = re.compile(URL_PATTERN)
+EMAIL_RE = re.compile(EMAIL_PATTERN)
+PUNCTUATION_RE = re.compile(PUNCTUATION_PATTERN)
+DIGIT_RE = re.compile(DIGIT_PATTERN)
+
+
+class _CharTable(dict):
+    """str.translate table doing the punctuation and digit passes at once.
+
+    Both passes look at one character at a time and never overlap (digits
+    are word characters), so punctuation -> space and digit -> deleted can
+    be applied in a single translate. Entries are filled on first sight,
+    using the original regexes, so the result is identical for any text.
+    """
+
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        if DIGIT_RE.match(char):
+            value = None
+        elif PUNCTUATION_RE.match(char):
+            value = " "
+        else:
+            value = codepoint
+        self[codepoint] = value
+        return value
+
+
+CLEAN_TABLE = _CharTable()
+
+
+LEMMA_CACHE_SIZE = 50000
+LEMMA_TABLE_VERSION = 1
+
+
+def get_lemma_table_path():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, "artifacts", "lemma_table.json")
+
+
+class LemmaCache:
+    """Bounded token -> lemma memo table with LRU eviction.
+
+    Review vocabulary is Zipfian, so a few thousand entries answer most
+    lookups. One cache can be shared by several preprocessors, and it can
+    be saved and loaded so other processes start warm.
+    """
+
+    def __init__(self, max_size=LEMMA_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._table = OrderedDict()
+        self._lock = threading.Lock()
+        # pool workers record new entries so the parent can merge them
+        self._inserted = None
+
+    def __len__(self):
+        return len(self._table)
+
+    def lookup(self, token, lemmatize):
+        with self._lock:
+            lemma = self._table.get(token)
+            if lemma is not None:
+                self._table.move_to_end(token)
+                self.hits += 1
+                return lemma
+            self.misses += 1
+
+        lemma = lemmatize(token)
+        self._store(token, lemma)
+        return lemma
+
+    def _store(self, token, lemma):
+        with self._lock:
+            self._table[token] = lemma
+            self._table.move_to_end(token)
+            if self._inserted is not None:
+                self._inserted.append((token, lemma))
+            while len(self._table) > self.max_size:
+                self._table.popitem(last=False)
+
+    def update(self, entries):
+        for token, lemma in entries:
+            self._store(token, lemma)
+
+    def items(self):
+        # least recently used first, so loading replays the same order
+        with self._lock:
+            return list(self._table.items())
+
+    def record_inserts(self):
+        self._inserted = []
+
+    def pop_inserted(self):
+        if self._inserted is None:
+            return []
+        inserted, self._inserted = self._inserted, []
+        return inserted
+
+    def add_counts(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def clear(self):
+        with self._lock:
+            self._table.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._table),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def save(self, path=None):
+        path = path or get_lemma_table_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": LEMMA_TABLE_VERSION,
+                "max_size": self.max_size,
+                "entries": self.items(),
+            }, f)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=None, max_size=None):
+        path = path or get_lemma_table_path()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("version") != LEMMA_TABLE_VERSION:
+            raise ValueError(f"Unsupported lemma table version in {path}")
+
+        cache = cls(max_size or data["max_size"])
+        cache.update(data["entries"])
+        return cache
+
+
+def whitespace_tokenize(text):
+    # clean_text leaves only word characters separated by single spaces
+    return text.split()
+
+
+# "nltk" is the Punkt/Treebank word_tokenize the models were trained with;
+# "fast" needs no NLTK data and is enough for text that went through clean_text
+TOKENIZERS = {
+    "nltk": nltk_word_tokenize,
+    "fast": whitespace_tokenize,
+}
+
+
 class TextPreprocessor:
-    def __init__(self):
-        self.stop_words = set(stopwords.words("english"))
-        self.lemmatizer = WordNetLemmatizer()
+    def __init__(self, min_token_length=3, lemma_cache=None,
+                 lemma_cache_size=LEMMA_CACHE_SIZE, tokenizer="nltk", stop_words=None):
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(
+                f"Unknown tokenizer '{tokenizer}', expected one of {sorted(TOKENIZERS)}"
+            )
+        self.tokenizer = tokenizer
+        self._tokenize = TOKENIZERS[tokenizer]
+        self.min_token_length = min_token_length
+        # stopwords and WordNet are loaded the first time they are needed;
+        # pass stop_words to use your own list instead of NLTK's
+        self._stop_words = set(stop_words) if stop_words is not None else None
+        self._lemmatizer = None
+        # pass a LemmaCache to share it, or lemma_cache_size=0 to disable
+        if lemma_cache is None and lemma_cache_size:
+            lemma_cache = LemmaCache(lemma_cache_size)
+        self.lemma_cache = lemma_cache
+
+    @property
+    def stop_words(self):
+        if self._stop_words is None:
+            self._stop_words = set(load_stop_words())
+        return self._stop_words
+
+    @stop_words.setter
+    def stop_words(self, value):
+        self._stop_words = set(value)
+
+    @property
+    def lemmatizer(self):
+        if self._lemmatizer is None:
+            self._lemmatizer = get_lemmatizer()
+        return self._lemmatizer
+
+    def get_config(self):
+        # constructor arguments, used to rebuild the same preprocessor in
+        # workers; covers everything settings() hashes except module constants
+        cache_size = self.lemma_cache.max_size if self.lemma_cache is not None else 0
+        return {
+            "min_token_length": self.min_token_length,
+            "lemma_cache_size": cache_size,
+            "tokenizer": self.tokenizer,
+            # None until loaded or set, so workers load NLTK's list themselves
+            "stop_words": sorted(self._stop_words) if self._stop_words is not None else None,
+        }
+
+    def settings(self):
+        """Everything that changes the output of preprocess_text."""
+        config = self.get_config()
+        # the cache size only affects speed, not the output, and the stop
+        # words are hashed below as resolved
+        del config["lemma_cache_size"]
+        del config["stop_words"]
+        return {
+            "config": config,
+            "stop_words": sorted(self.stop_words),
+            "patterns": [HTML_TAG_PATTERN, URL_PATTERN, EMAIL_PATTERN,
+                         PUNCTUATION_PATTERN, DIGIT_PATTERN],
+            "text_fields": list(TEXT_FIELDS),
+        }
 
     def clean_text(self, text):
         text = text.lower()
-        
-        text = re.sub(r"<.*?>", "", text)  # html tags
-        text = re.sub(r"http\S+|www\.\S+", "", text)
-        text = re.sub(r"\S+@\S+", "", text)
-        # punctuation
-        text = re.sub(r"[^\w\s]", " ", text)
-        text = re.sub(r"\d+", "", text)
-        
-        text = " ".join(text.split())
 
-        return text
+        # these three depend on each other's output, so they stay in order;
+        # a cheap substring check skips the regex when it cannot match
+        if "<" in text:
+            text = HTML_TAG_RE.sub("", text)  # html tags
+        if "http" in text or "www." in text:
+            text = URL_RE.sub("", text)
+        if "@" in text:
+            text = EMAIL_RE.sub("", text)
+
+        # punctuation -> space and digits removed, in one pass
+        text = text.translate(CLEAN_TABLE)
+
+        return " ".join(text.split())
+
+    def clean_many(self, texts):
+        clean = self.clean_text
+        return [clean(text) for text in texts]
+
+    def lemmatize(self, token):
+        if self.lemma_cache is None:
+            return self.lemmatizer.lemmatize(token)
+        return self.lemma_cache.lookup(token, self.lemmatizer.lemmatize)
 
     def tokenize_and_lemmatize(self, text):
-        tokens = word_tokenize(text)
+        tokens = self._tokenize(text)
         
-        tokens = [self.lemmatizer.lemmatize(token) 
+        tokens = [self.lemmatize(token) 
                  for token in tokens 
-                 if token not in self.stop_words and len(token) > 2]
+                 if token not in self.stop_words and len(token) >= self.min_token_length]
 
         return tokens
 
-    def preprocess_reviews(self, reviews):
+    def preprocess_text(self, text):
+        cleaned = self.clean_text(text)
+        tokens = self.tokenize_and_lemmatize(cleaned)
+        return " ".join(tokens)
+
+    def preprocess_reviews(self, reviews, n_jobs=1, chunk_size=None, verbose=True):
+        """Clean, tokenize and lemmatize every review.
+
+        n_jobs > 1 splits the reviews into chunks over a process pool
+        (-1 uses every core). Output order always matches the input.
+        verbose=False drops the progress lines, e.g. when serving requests.
+        """
+        n_jobs = resolve_n_jobs(n_jobs)
+        if n_jobs > 1 and len(reviews) > 1:
+            return self._preprocess_parallel(reviews, n_jobs, chunk_size)
+
         processed_reviews = []
 
         for i, review in enumerate(reviews):
-            if i % 1000 == 0:
+            if verbose and i % 1000 == 0:
                 print(f"Processing review {i}/{len(reviews)}")
 
-            cleaned = self.clean_text(review)
-            
-            tokens = self.tokenize_and_lemmatize(cleaned)
-            processed_reviews.append(" ".join(tokens))
+            processed_reviews.append(self.preprocess_text(review))
+
+        return processed_reviews
+
+    def create_pool(self, n_jobs, mp_context=None):
+        """Process pool whose workers each hold a copy of this preprocessor.
+
+        Submit lists of texts with pool.submit(preprocess_chunk, texts);
+        each result is (processed, new_lemmas, (hits, misses)), see
+        merge_lemmas.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        # workers start from a copy of our lemma table and send back what they add
+        lemma_entries = self.lemma_cache.items() if self.lemma_cache is not None else []
+        return ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp_context,
+                                   initializer=_init_worker,
+                                   initargs=(self.get_config(), lemma_entries))
+
+    def merge_lemmas(self, entries, counts=(0, 0)):
+        # a worker's new table entries plus the hits and misses behind them,
+        # so stats() covers lookups made in the pool too
+        if self.lemma_cache is not None:
+            self.lemma_cache.update(entries)
+            self.lemma_cache.add_counts(*counts)
+
+    def _preprocess_parallel(self, reviews, n_jobs, chunk_size=None):
+        if chunk_size is None:
+            # a few chunks per worker keeps the pool busy if some run slow
+            chunk_size = max(1, -(-len(reviews) // (n_jobs * 4)))
+
+        chunks = [reviews[i:i + chunk_size] for i in range(0, len(reviews), chunk_size)]
+        n_jobs = min(n_jobs, len(chunks))
+        print(f"Processing {len(reviews)} reviews in {len(chunks)} chunks on {n_jobs} processes")
+
+        processed_reviews = []
+        with self.create_pool(n_jobs) as executor:
+            # map() hands results back in submission order
+            for chunk_result, new_lemmas, counts in executor.map(preprocess_chunk, chunks):
+                processed_reviews.extend(chunk_result)
+                self.merge_lemmas(new_lemmas, counts)
+                print(f"Processed {len(processed_reviews)}/{len(reviews)}")
 
         return processed_reviews
 
 
+def resolve_n_jobs(n_jobs):
+    cpu_count = os.cpu_count() or 1
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, cpu_count + 1 + n_jobs)
+    return max(1, n_jobs)
+
+
+# one preprocessor per pool worker, built by the pool initializer
+_worker_preprocessor = None
+
+
+def _init_worker(config, lemma_entries=()):
+    global _worker_preprocessor
+    _worker_preprocessor = TextPreprocessor(**config)
+    # load stopwords and WordNet now rather than on the worker's first chunk
+    _worker_preprocessor.stop_words
+    _worker_preprocessor.lemmatizer.lemmatize("reviews")
+
+    cache = _worker_preprocessor.lemma_cache
+    if cache is not None:
+        cache.update(lemma_entries)
+        cache.record_inserts()
+
+
+def preprocess_chunk(chunk):
+    # runs in a pool worker started by TextPreprocessor.create_pool
+    cache = _worker_preprocessor.lemma_cache
+    if cache is None:
+        return [_worker_preprocessor.preprocess_text(review) for review in chunk], [], (0, 0)
+
+    hits, misses = cache.hits, cache.misses
+    processed = [_worker_preprocessor.preprocess_text(review) for review in chunk]
+    return processed, cache.pop_inserted(), (cache.hits - hits, cache.misses - misses)
+
+
+CORPUS_CACHE_VERSION = 1
+
+
+def get_cache_directory():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, "artifacts", "cache")
+
+
+def corpus_cache_key(preprocessor, file_paths):
+    """Hash of the source files plus the preprocessing settings."""
+    digest = hashlib.sha256()
+    digest.update(f"corpus-v{CORPUS_CACHE_VERSION}".encode())
+    digest.update(json.dumps(preprocessor.settings(), sort_keys=True).encode())
+
+    for file_path in file_paths:
+        digest.update(os.path.basename(os.path.dirname(file_path)).encode())
+        digest.update(os.path.basename(file_path).encode())
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+
+    return digest.hexdigest()[:20]
+
+
+def save_corpus_cache(path, reviews, labels):
+    import numpy as np
+
+    # columnar layout: one utf-8 blob, character offsets and a label column
+    text = "".join(reviews)
+    offsets = np.zeros(len(reviews) + 1, dtype=np.int64)
+    np.cumsum([len(review) for review in reviews], out=offsets[1:])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            text=np.frombuffer(text.encode("utf-8"), dtype=np.uint8),
+            offsets=offsets,
+            labels=np.asarray(labels, dtype=np.int8),
+        )
+    os.replace(tmp_path, path)
+
+
+def load_corpus_cache(path):
+    import numpy as np
+
+    with np.load(path) as data:
+        text = data["text"].tobytes().decode("utf-8")
+        offsets = data["offsets"].tolist()
+        labels = data["labels"].tolist()
+
+    reviews = [text[offsets[i]:offsets[i + 1]] for i in range(len(labels))]
+    return reviews, labels
+
+
+def load_preprocessed_corpus(preprocessor=None, n_jobs=-1, use_cache=True):
+    """Load and preprocess the labelled corpus, reusing the on-disk cache.
+
+    The cache file name is a hash of the .review files and the
+    preprocessor settings, so editing either one misses the cache and the
+    corpus is rebuilt. Outliers are not removed here.
+    """
+    if preprocessor is None:
+        preprocessor = TextPreprocessor()
+
+    file_paths = [path for _, pos_file, neg_file in iter_domain_files()
+                  for path in (pos_file, neg_file)]
+    cache_path = os.path.join(
+        get_cache_directory(),
+        f"corpus-{corpus_cache_key(preprocessor, file_paths)}.npz"
+    )
+
+    if use_cache and os.path.isfile(cache_path):
+        processed_reviews, labels = load_corpus_cache(cache_path)
+        print(f"Loaded {len(processed_reviews)} preprocessed reviews from {cache_path}")
+        return processed_reviews, labels
+
+    reviews, labels = load_labelled_reviews()
+    processed_reviews = preprocessor.preprocess_reviews(reviews, n_jobs=n_jobs)
+
+    if use_cache:
+        save_corpus_cache(cache_path, processed_reviews, labels)
+        print(f"Saved preprocessed corpus to {cache_path}")
+
+        # lets the web app and later jobs start with a warm lemma cache
+        if preprocessor.lemma_cache is not None:
+            table_path = preprocessor.lemma_cache.save()
+            print(f"Saved lemma table to {table_path}")
+
+    return processed_reviews, labels
+
+
 def remove_outliers(reviews, labels, min_length=10, max_length=1000):
     filtered_reviews = []
     filtered_labels = []
@@ -156,6 +754,8 @@ def remove_outliers(reviews, labels, min_length=10, max_length=1000):
 
 
 def check_data_quality(reviews, labels):
+    import pandas as pd
+
     df = pd.DataFrame({"review": reviews, "label": labels})
 
     print("\nClass distribution:")
@@ -176,7 +776,7 @@ def main():
 
     print("\nPreprocessing...\n")
     preprocessor = TextPreprocessor()
-    processed_reviews = preprocessor.preprocess_reviews(raw_reviews)
+    processed_reviews = preprocessor.preprocess_reviews(raw_reviews, n_jobs=-1)
 
     # remove outliers
     processed_reviews, labels = remove_outliers(processed_reviews, labels)
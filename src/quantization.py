@@ -0,0 +1,142 @@
+# quantization.py
+# Post-training quantized exports of the trained models, for serving
+
+import json
+import os
+
+import numpy as np
+
+from feature_engineering import write_model_metadata
+
+# suffix -> converter settings; best_lstm.h5 becomes best_lstm_int8.tflite
+# and best_lstm_fp16.tflite, served as ?model=lstm_int8 / lstm_fp16
+QUANTIZATION_MODES = {
+    # dynamic range: weights stored as int8, activations stay float
+    "int8": "dynamic",
+    # weights stored as float16, computed in float32 on CPU
+    "fp16": "float16",
+}
+
+
+def get_quantized_path(model_path, suffix):
+    return os.path.splitext(model_path)[0] + f"_{suffix}.tflite"
+
+
+def get_quantization_report_path(model_path):
+    return os.path.splitext(model_path)[0] + ".quantization.json"
+
+
+def convert_model(model, max_len, mode="dynamic"):
+    """Convert a Keras model to a quantized TFLite flatbuffer.
+
+    The model is cloned onto a (None, max_len) int32 input, the same
+    signature InferenceModel traces, so the batch size can change per call.
+    The clone unrolls its recurrent layers over the max_len steps: TFLite
+    cannot lower the loop of a Keras 3 LSTM with a dynamic batch size to
+    builtin ops, and without them only full TensorFlow can run the export.
+    """
+    import tensorflow as tf
+
+    if mode not in ("dynamic", "float16"):
+        raise ValueError(f"Unknown quantization mode {mode!r}")
+
+    fixed_length = tf.keras.models.clone_model(
+        model, input_tensors=tf.keras.Input((max_len,), dtype="int32"),
+        clone_function=lambda layer: layer.__class__.from_config(_unroll(layer.get_config())))
+    fixed_length.set_weights(model.get_weights())
+
+    def converter(ops):
+        converter = tf.lite.TFLiteConverter.from_keras_model(fixed_length)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if mode == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        converter.target_spec.supported_ops = ops
+        return converter
+
+    try:
+        # builtin ops only, so tflite_runtime can serve the export
+        return converter([tf.lite.OpsSet.TFLITE_BUILTINS]).convert()
+    except Exception as e:
+        # the export then needs an interpreter linked with the Flex delegate
+        print(f"Builtin-only conversion failed ({e}), keeping TensorFlow ops")
+        return converter([tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]).convert()
+
+
+def _unroll(config):
+    # set unroll on every recurrent layer config, including wrapped ones
+    if isinstance(config, dict):
+        if "unroll" in config:
+            config["unroll"] = True
+        for value in config.values():
+            _unroll(value)
+    elif isinstance(config, list):
+        for value in config:
+            _unroll(value)
+    return config
+
+
+def accuracy(predictions, labels):
+    return float(np.mean((np.asarray(predictions) > 0.5).astype(int) == np.asarray(labels)))
+
+
+def export_quantized(model_path, vocab, X_test, y_test, modes=QUANTIZATION_MODES):
+    """Write a quantized .tflite next to model_path for each mode and report the accuracy delta.
+
+    Each export is stamped with the vocabulary like the .h5 it came from.
+    The report compares every export with the float32 checkpoint on the
+    same test set and is saved as <model>.quantization.json.
+    """
+    from model import load_saved_model
+    from serving import InferenceModel, TFLiteInferenceModel
+
+    model = load_saved_model(model_path)
+    baseline = InferenceModel(model, vocab.max_len).predict(X_test)
+
+    report = {
+        "model": model_path,
+        "test_samples": len(y_test),
+        "float32": {
+            "accuracy": accuracy(baseline, y_test),
+            "size_bytes": os.path.getsize(model_path),
+        },
+    }
+
+    for suffix, mode in modes.items():
+        path = get_quantized_path(model_path, suffix)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(convert_model(model, vocab.max_len, mode))
+        os.replace(tmp_path, path)
+        write_model_metadata(path, vocab)
+
+        predictions = TFLiteInferenceModel(path, vocab.max_len).predict(X_test)
+        quantized_accuracy = accuracy(predictions, y_test)
+        report[suffix] = {
+            "path": path,
+            "mode": mode,
+            "accuracy": quantized_accuracy,
+            "accuracy_delta": quantized_accuracy - report["float32"]["accuracy"],
+            # share of reviews given the same label as the float32 model
+            "agreement": float(np.mean((predictions > 0.5) == (baseline > 0.5))),
+            "max_abs_diff": float(np.max(np.abs(predictions - baseline))) if len(baseline) else 0.0,
+            "size_bytes": os.path.getsize(path),
+        }
+
+    with open(get_quantization_report_path(model_path), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_quantization_report(report)
+    return report
+
+
+def print_quantization_report(report):
+    print(f"\nQuantized exports of {report['model']} ({report['test_samples']} test reviews):")
+    base = report["float32"]
+    print(f"{'float32':>8}  accuracy {base['accuracy']:.4f}  "
+          f"size {base['size_bytes'] / 2**20:6.2f} MB")
+    for suffix in QUANTIZATION_MODES:
+        if suffix not in report:
+            continue
+        entry = report[suffix]
+        print(f"{suffix:>8}  accuracy {entry['accuracy']:.4f} ({entry['accuracy_delta']:+.4f})  "
+              f"size {entry['size_bytes'] / 2**20:6.2f} MB  agreement {entry['agreement']:.2%}")
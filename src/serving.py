@@ -0,0 +1,1058 @@
+# serving.py
+# Helpers for serving the sentiment models behind app.py
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# served checkpoints are models/best_<name><ext>
+MODEL_PREFIX = "best_"
+MODEL_EXTENSIONS = (".h5", ".tflite")
+
+
+# length bucket ceilings for InferenceModel(buckets=...); rows longer than
+# the last one are run at the full max_len
+LENGTH_BUCKETS = (16, 32, 64, 128)
+
+
+def get_length_buckets():
+    """LENGTH_BUCKETS, or the comma-separated SENTIMENT_LENGTH_BUCKETS if set.
+
+    An empty value turns bucketing off and pads every row to max_len.
+    """
+    value = os.environ.get('SENTIMENT_LENGTH_BUCKETS')
+    if value is None:
+        return LENGTH_BUCKETS
+    return tuple(int(b) for b in value.split(',') if b.strip())
+
+
+class InferenceModel:
+    """Run a Keras model's forward pass through one traced tf.function.
+
+    model.predict builds a data adapter and a predict loop on every call,
+    which costs milliseconds before any math for a single row. Here the
+    graph is traced once for a (None, max_len) int32 signature and reused
+    for every batch size.
+
+    With buckets, each row is cut to the smallest bucket ceiling that still
+    holds its tokens plus padding_margin(model), rows are sorted by length
+    and every bucket runs as its own batch through a second graph traced
+    for any length, so a 12-token review does not pay for max_len timesteps.
+    That only gives the same outputs when the recurrent layers mask the
+    padding (mask_zero=True on the Embedding, or a PaddingMask), so a probe
+    batch is scored both ways first. If they disagree, bucketing is turned off for a model
+    without a mask (an old checkpoint) and a ValueError raised for one with
+    a mask.
+
+    forward replaces model(rows, training=False), e.g. to run the model on
+    weights it does not own (see build_shared_model).
+    """
+
+    def __init__(self, model, max_len=None, buckets=None, forward=None):
+        import tensorflow as tf
+
+        self.model = model
+        self.max_len = max_len or model.input_shape[1]
+        if self.max_len is None:
+            raise ValueError("The model accepts any sequence length, pass max_len")
+        forward = forward or (lambda rows: model(rows, training=False))
+        self._forward = tf.function(
+            forward,
+            input_signature=[tf.TensorSpec((None, self.max_len), tf.int32)],
+        )
+        # trace up front so the first request does not pay for it
+        self._forward.get_concrete_function()
+
+        self.buckets = None
+        if buckets:
+            self.margin = padding_margin(model)
+            self._forward_any_length = tf.function(
+                forward,
+                input_signature=[tf.TensorSpec((None, None), tf.int32)],
+            )
+            self.buckets = self._check_buckets(buckets)
+
+    def _check_buckets(self, buckets):
+        buckets = sorted(b for b in buckets if b < self.max_len)
+        rng = np.random.default_rng(0)
+        lengths = [0, 1, 5, 15, self.max_len // 2, self.max_len - 1, self.max_len]
+        probe = np.zeros((len(lengths), self.max_len), dtype=np.int32)
+        for row, length in enumerate(lengths):
+            probe[row, :length] = rng.integers(1, 50, size=length)
+
+        expected = self._forward(probe).numpy()
+        self.buckets = buckets
+        masked = masks_padding(self.model)
+        try:
+            matches = np.allclose(self._bucketed(probe), expected, atol=1e-5)
+        except Exception as e:
+            if masked:
+                raise
+            print(f"Length bucketing failed ({e})")
+            matches = False
+        if not matches:
+            if masked:
+                # the mask should make padding irrelevant, so this is a bug
+                # rather than an old checkpoint
+                raise ValueError("Model masks its padding but gives different outputs "
+                                 "at shorter lengths, cannot bucket it")
+            print("Model output depends on padding length (no padding mask?), "
+                  f"padding every row to {self.max_len}")
+            return None
+        return buckets
+
+    def bucket_ceiling(self, length):
+        for bucket in self.buckets:
+            if bucket >= length + self.margin:
+                return bucket
+        return self.max_len
+
+    def _bucketed(self, rows):
+        # post or pre padded, a row ends at its last non-zero id
+        nonzero = rows != 0
+        lengths = np.where(nonzero.any(axis=1),
+                           rows.shape[1] - np.argmax(nonzero[:, ::-1], axis=1), 0)
+        ceilings = np.array([self.bucket_ceiling(length) for length in lengths])
+        order = np.argsort(lengths, kind="stable")
+
+        outputs = None
+        for ceiling in np.unique(ceilings):
+            # rows of one bucket, shortest first, as one tight batch
+            index = order[ceilings[order] == ceiling]
+            if ceiling == self.max_len:
+                result = self._forward(rows[index]).numpy()
+            else:
+                result = self._forward_any_length(np.ascontiguousarray(rows[index, :ceiling])).numpy()
+            if outputs is None:
+                outputs = np.empty((len(rows),) + result.shape[1:], dtype=result.dtype)
+            outputs[index] = result
+        return outputs
+
+    def __call__(self, rows):
+        # uint16 id matrices are widened to the traced int32 signature
+        rows = np.asarray(rows, dtype=np.int32)
+        if self.buckets:
+            return self._bucketed(rows)
+        return self._forward(rows).numpy()
+
+    def predict(self, rows):
+        """Return one sigmoid output per row."""
+        return self(rows)[:, 0]
+
+
+def masks_padding(model):
+    """Whether the model masks id 0, with mask_zero=True or a PaddingMask layer."""
+    from model import PaddingMask
+
+    return any(getattr(layer, "mask_zero", False) or isinstance(layer, PaddingMask)
+               for layer in model.layers)
+
+
+def padding_margin(model):
+    """Padding a row needs past its last token for unmasked Conv1D layers to match.
+
+    Masked LSTMs ignore padding, but a convolution still slides over it.
+    With kernel_size - 1 (times dilation) pad positions after the text, per
+    stacked Conv1D, every window that touches text is computed, and one more
+    adds the all-padding window that global max pooling sees at full length.
+    """
+    import tensorflow as tf
+
+    margin = 1
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.Conv1D):
+            margin += (layer.kernel_size[0] - 1) * layer.dilation_rate[0]
+    return margin
+
+
+class TFLiteInferenceModel:
+    """Run a quantized .tflite export with the InferenceModel interface.
+
+    The interpreter is resized only when the batch size changes, and calls
+    are serialized because one interpreter cannot run two batches at once.
+    The flatbuffer is mapped from disk, so its weights are shared by every
+    process serving the same file. tflite_runtime is used when installed,
+    which avoids loading the full TensorFlow runtime; exports that kept
+    TensorFlow ops need tf.lite instead.
+    """
+
+    def __init__(self, path, max_len):
+        self.path = path
+        self.max_len = max_len
+        try:
+            from tflite_runtime.interpreter import Interpreter
+            self._interpreter = Interpreter(model_path=path)
+            self._interpreter.allocate_tensors()
+        except (ImportError, RuntimeError, ValueError):
+            import tensorflow as tf
+            self._interpreter = tf.lite.Interpreter(model_path=path)
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        self._lock = threading.Lock()
+        self._resize(1)
+
+    def _resize(self, batch_size):
+        self._interpreter.resize_tensor_input(self._input, [batch_size, self.max_len])
+        self._interpreter.allocate_tensors()
+        self._batch_size = batch_size
+
+    def __call__(self, rows):
+        rows = np.asarray(rows, dtype=np.int32)
+        with self._lock:
+            if len(rows) != self._batch_size:
+                self._resize(len(rows))
+            self._interpreter.set_tensor(self._input, rows)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+    def predict(self, rows):
+        """Return one sigmoid output per row."""
+        return self(rows)[:, 0]
+
+
+def as_inference_model(model, max_len=None):
+    if isinstance(model, InferenceModel):
+        return model
+    return InferenceModel(model, max_len)
+
+
+def load_inference_model(path, vocab, buckets=None):
+    """Load a saved Keras model or quantized .tflite export for serving after checking its vocabulary."""
+    from feature_engineering import check_model_vocabulary
+
+    check_model_vocabulary(path, vocab)
+    if path.endswith(".tflite"):
+        return TFLiteInferenceModel(path, vocab.max_len)
+
+    from model import load_saved_model
+    return InferenceModel(load_saved_model(path), vocab.max_len, buckets)
+
+
+def discover_models(models_dir="models"):
+    paths = {}
+    if os.path.isdir(models_dir):
+        for filename in sorted(os.listdir(models_dir)):
+            stem, ext = os.path.splitext(filename)
+            if stem.startswith(MODEL_PREFIX) and ext in MODEL_EXTENSIONS:
+                paths[stem[len(MODEL_PREFIX):]] = os.path.join(models_dir, filename)
+    return paths
+
+
+class UnknownModelError(KeyError):
+    pass
+
+
+class ServedModel:
+    """One loaded checkpoint together with the vocabulary it was checked against."""
+
+    def __init__(self, name, path, version, inference, vocab):
+        self.name = name
+        self.path = path
+        self.version = version
+        self.inference = inference
+        self.vocab = vocab
+        self.loaded_at = time.time()
+
+    def predict(self, rows):
+        return self.inference.predict(rows)
+
+    def encode(self, texts):
+        return self.vocab.encode(texts, self.vocab.max_len)
+
+
+class ModelRegistry:
+    """Serve every models/best_<name>.h5 (or .tflite export) by name, loading each on first use.
+
+    get() compares the file's stat with the loaded copy on every call.
+    When a new checkpoint has been written (and left alone for min_age_s,
+    so a half-written file is not picked up) it is loaded next to the old
+    one and swapped in under a per-model lock. Requests already holding the
+    old ServedModel finish with it, and it is freed once they let go. If
+    the new file fails to load, the old model keeps serving.
+    """
+
+    def __init__(self, models_dir="models", default="hybrid", load_model=load_inference_model,
+                 load_vocab=None, vocab_path=None, min_age_s=1.0):
+        if load_vocab is None:
+            from feature_engineering import load_vocabulary, get_vocab_path
+            load_vocab = load_vocabulary
+            vocab_path = vocab_path or get_vocab_path()
+
+        self.models_dir = models_dir
+        self.default = default
+        self.load_model = load_model
+        self.load_vocab = load_vocab
+        self.vocab_path = vocab_path
+        self.min_age_s = min_age_s
+        self.loads = 0
+        self.swaps = 0
+        self.failed_loads = 0
+
+        self._paths = {}
+        self._loaded = {}
+        self._failed = {}
+        self._vocab = None
+        self._vocab_version = None
+        self._lock = threading.Lock()
+        self._model_locks = {}
+
+    def discover(self):
+        """Map model names to checkpoint paths, e.g. {"cnn": "models/best_cnn.h5"}."""
+        self._paths = discover_models(self.models_dir)
+        return self._paths
+
+    def names(self):
+        return sorted(self.discover())
+
+    def get(self, name=None):
+        name = name or self.default
+        path = self._paths.get(name) or self.discover().get(name)
+        if path is None:
+            raise UnknownModelError(f"Unknown model {name!r}, available: {', '.join(self.names())}")
+
+        version = artifact_version(*filter(None, [path, self.vocab_path]))
+        current = self._loaded.get(name)
+        if current is not None and current.version == version:
+            return current
+
+        with self._model_lock(name):
+            current = self._loaded.get(name)
+            if current is not None and current.version == version:
+                return current
+            if current is not None and (self._failed.get(name) == version or self._too_new(path)):
+                return current
+
+            try:
+                served = ServedModel(name, path, version, *self._load(path))
+            except Exception as e:
+                if current is None:
+                    raise
+                print(f"Reloading {path} failed, still serving the previous copy: {e}")
+                self._failed[name] = version
+                self.failed_loads += 1
+                return current
+
+            print(f"Loaded {name} model from {path}")
+            # swap; the registry drops its reference to the old copy here
+            self._loaded[name] = served
+            self.loads += 1
+            if current is not None:
+                self.swaps += 1
+            return served
+
+    def _model_lock(self, name):
+        with self._lock:
+            return self._model_locks.setdefault(name, threading.Lock())
+
+    def _too_new(self, path):
+        try:
+            return time.time() - os.stat(path).st_mtime < self.min_age_s
+        except FileNotFoundError:
+            return True
+
+    def _load(self, path):
+        vocab = self._current_vocab()
+        return self.load_model(path, vocab), vocab
+
+    def _current_vocab(self):
+        # models checked against the same vocabulary file share one copy
+        version = artifact_version(self.vocab_path) if self.vocab_path else None
+        with self._lock:
+            if self._vocab is None or version != self._vocab_version:
+                vocab = self.load_vocab()
+                if vocab is None:
+                    raise RuntimeError("No vocabulary found in artifacts/, train a model first")
+                self._vocab, self._vocab_version = vocab, version
+            return self._vocab
+
+    def stats(self):
+        loaded = {}
+        for name, served in list(self._loaded.items()):
+            loaded[name] = {
+                "path": served.path,
+                "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(served.loaded_at)),
+            }
+        return {
+            "default": self.default,
+            "available": self.names(),
+            "loaded": loaded,
+            "loads": self.loads,
+            "swaps": self.swaps,
+            "failed_loads": self.failed_loads,
+        }
+
+
+def artifact_version(*paths):
+    """Identify the current contents of model/vocabulary files by stat."""
+    version = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            version.append((path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            version.append((path, None, None))
+    return tuple(version)
+
+
+# arrays in a shared weights file start on this boundary, the alignment
+# TensorFlow needs to use a buffer in place
+SHARED_ALIGNMENT = 64
+
+
+def get_shared_store_directory():
+    from feature_engineering import get_artifacts_directory
+    return os.path.join(get_artifacts_directory(), "shared")
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def read_h5_checkpoint(path):
+    """Read a Keras .h5 checkpoint with h5py, without importing TensorFlow.
+
+    Returns the model config JSON and, for each layer in saved order, its
+    weight arrays in the order the layer creates them.
+    """
+    import h5py
+
+    def names(values):
+        return [v.decode("utf-8") if isinstance(v, bytes) else str(v) for v in values]
+
+    with h5py.File(path, "r") as f:
+        config = f.attrs["model_config"]
+        group = f["model_weights"] if "model_weights" in f else f
+        layers = []
+        for layer_name in names(group.attrs["layer_names"]):
+            layer_group = group[layer_name]
+            weights = [layer_group[name][()] for name in names(layer_group.attrs["weight_names"])]
+            layers.append((layer_name, weights))
+
+    if isinstance(config, bytes):
+        config = config.decode("utf-8")
+    return config, layers
+
+
+class SharedVocabulary:
+    """A Vocabulary whose word table lives in memory-mapped arrays.
+
+    The words are stored sorted as fixed-width UTF-8 bytes next to their
+    ids, and each text's words are found with one searchsorted over that
+    table. encode gives the same matrix as Vocabulary.encode, but no
+    process builds its own word -> id dict, so forked workers all read the
+    same pages.
+    """
+
+    def __init__(self, words, ids, header):
+        self.words = words
+        self.ids = ids
+        self.max_words = header["max_words"]
+        self.max_len = header["max_len"]
+        self.oov_token = header["oov_token"]
+        self.oov_id = header["oov_id"]
+        self.filters = header["filters"]
+        self.lower = header["lower"]
+        self.split = header["split"]
+        self.vocab_hash = header["vocab_hash"]
+        self._translate = str.maketrans({c: self.split for c in self.filters})
+
+    @staticmethod
+    def export(vocab, directory):
+        """Write vocab's table to directory and return the header to store with it."""
+        keys = [word.encode("utf-8") for word in vocab.words]
+        width = max((len(key) for key in keys), default=1)
+        words = np.array(keys, dtype=f"S{width}")
+        ids = np.arange(1, len(keys) + 1, dtype=vocab.id_dtype)
+        order = np.argsort(words, kind="stable")
+
+        np.save(os.path.join(directory, "vocab.words.npy"), words[order])
+        np.save(os.path.join(directory, "vocab.ids.npy"), ids[order])
+        return dict(vocab.config(), vocab_hash=vocab.vocab_hash, size=len(keys))
+
+    @classmethod
+    def attach(cls, directory, header):
+        words = np.load(os.path.join(directory, "vocab.words.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(directory, "vocab.ids.npy"), mmap_mode="r")
+        if len(words) != header["size"] or len(ids) != header["size"]:
+            raise ValueError(f"Shared vocabulary in {directory} is corrupted")
+        return cls(words, ids, header)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def id_dtype(self):
+        return self.ids.dtype
+
+    def split_text(self, text):
+        # same as keras text_to_word_sequence
+        if self.lower:
+            text = text.lower()
+        text = text.translate(self._translate)
+        return [word for word in text.split(self.split) if word]
+
+    def lookup(self, words):
+        """Return the ids for a list of words, dropping unknown ones if there is no OOV id."""
+        keys = [word.encode("utf-8") for word in words]
+        if not keys or not len(self.words):
+            found = np.zeros(len(keys), dtype=bool)
+            ids = np.zeros(len(keys), dtype=self.ids.dtype)
+        else:
+            table = self.words
+            # a key wider than the table would be truncated into a false match
+            fits = np.fromiter((len(key) <= table.itemsize for key in keys), dtype=bool, count=len(keys))
+            keys = np.array(keys, dtype=table.dtype)
+            positions = np.minimum(np.searchsorted(table, keys), len(table) - 1)
+            found = fits & (table[positions] == keys)
+            ids = self.ids[positions]
+
+        if self.oov_id is None:
+            return ids[found]
+        return np.where(found, ids, self.oov_id).astype(self.ids.dtype)
+
+    def encode(self, texts, max_len=None, dtype=None):
+        max_len = max_len or self.max_len
+        encoded = np.zeros((len(texts), max_len), dtype=dtype or self.id_dtype)
+
+        for row, text in enumerate(texts):
+            words = self.split_text(text)
+            if self.oov_id is not None:
+                # one id per word, so the rest would be truncated anyway
+                words = words[:max_len]
+            row_ids = self.lookup(words)[:max_len]
+            encoded[row, :len(row_ids)] = row_ids
+
+        return encoded
+
+
+class SharedModelStore:
+    """Checkpoints and the vocabulary, exported once for forked workers to map.
+
+    export() runs in the prefork parent before any worker exists and never
+    imports TensorFlow. Each checkpoint becomes one flat file of aligned
+    weight arrays plus a JSON index, and the vocabulary a sorted word table.
+    Workers map them with np.memmap and run the model on those pages (see
+    build_shared_model), so they are shared through the page cache instead
+    of copied into every process. Each export
+    records the stat of its source file and is skipped once that changes,
+    so a retrained checkpoint is loaded privately until the next export.
+    """
+
+    def __init__(self, directory=None, buckets=None):
+        self.directory = directory or get_shared_store_directory()
+        # length buckets for the InferenceModels it builds
+        self.buckets = buckets
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def export(self, models_dir="models", vocab=None, vocab_path=None):
+        """Export the vocabulary and every models/best_<name>.h5, return the model names."""
+        from feature_engineering import Vocabulary, get_vocab_path
+
+        vocab_path = vocab_path or get_vocab_path()
+        vocab = vocab or Vocabulary.load(vocab_path)
+        os.makedirs(self.directory, exist_ok=True)
+
+        header = SharedVocabulary.export(vocab, self.directory)
+        header["source"] = source_stamp(vocab_path)
+        self._write_json("vocab.json", header)
+
+        names = []
+        for name, path in discover_models(models_dir).items():
+            # .tflite exports are already mapped from disk by the interpreter
+            if not path.endswith(".h5"):
+                continue
+            self.export_model(name, path)
+            names.append(name)
+        return names
+
+    def export_model(self, name, path):
+        config, layers = read_h5_checkpoint(path)
+
+        index = {"config": config, "source": source_stamp(path), "layers": []}
+        offset = 0
+        tmp_path = self._path(f"{name}.weights.tmp")
+        with open(tmp_path, "wb") as f:
+            for layer_name, weights in layers:
+                entries = []
+                for array in weights:
+                    array = np.ascontiguousarray(array)
+                    padding = -offset % SHARED_ALIGNMENT
+                    f.write(b"\0" * padding)
+                    offset += padding
+                    entries.append({"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+                    f.write(array.tobytes())
+                    offset += array.nbytes
+                index["layers"].append({"name": layer_name, "weights": entries})
+        os.replace(tmp_path, self._path(f"{name}.weights"))
+        # the index goes last, so a reader never finds one without its weights
+        self._write_json(f"{name}.json", index)
+
+    def _write_json(self, filename, payload):
+        tmp_path = self._path(filename + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self._path(filename))
+
+    def _read_current(self, filename, source_path):
+        """The export's index, or None if it is missing or older than source_path."""
+        try:
+            with open(self._path(filename)) as f:
+                index = json.load(f)
+            if index["source"] == source_stamp(source_path):
+                return index
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        return None
+
+    def attach_vocabulary(self, vocab_path=None):
+        """Map the exported vocabulary, or return None if it is missing or stale."""
+        from feature_engineering import get_vocab_path
+
+        header = self._read_current("vocab.json", vocab_path or get_vocab_path())
+        if header is None:
+            return None
+        return SharedVocabulary.attach(self.directory, header)
+
+    def load_vocabulary(self):
+        vocab = self.attach_vocabulary()
+        if vocab is None:
+            from feature_engineering import load_vocabulary
+            print(f"No current shared vocabulary in {self.directory}, loading a private copy")
+            vocab = load_vocabulary()
+        return vocab
+
+    def attach_weights(self, name, index):
+        """Yield (layer name, weight views) for an exported checkpoint.
+
+        The file is mapped copy-on-write: DLPack only exports writable
+        arrays, and since nothing writes to them every page stays shared.
+        """
+        blob = np.memmap(self._path(f"{name}.weights"), dtype=np.uint8, mode="c")
+        for layer in index["layers"]:
+            weights = []
+            for entry in layer["weights"]:
+                dtype = np.dtype(entry["dtype"])
+                count = int(np.prod(entry["shape"], dtype=np.int64))
+                view = blob[entry["offset"]:entry["offset"] + count * dtype.itemsize]
+                weights.append(view.view(dtype).reshape(entry["shape"]))
+            yield layer["name"], weights
+
+    def load_model(self, path, vocab):
+        """ModelRegistry load_model: serve path from its export when that is current."""
+        from feature_engineering import check_model_vocabulary
+
+        if not path.endswith(".h5"):
+            return load_inference_model(path, vocab)
+
+        name = os.path.basename(os.path.splitext(path)[0])[len(MODEL_PREFIX):]
+        index = self._read_current(f"{name}.json", path)
+        if index is None:
+            print(f"No current shared export of {path}, loading a private copy")
+            return load_inference_model(path, vocab, self.buckets)
+
+        check_model_vocabulary(path, vocab)
+        try:
+            model, forward = build_shared_model(index["config"], self.attach_weights(name, index))
+        except ImportError as e:
+            print(f"Cannot serve shared weights ({e}), loading a private copy of {path}")
+            return load_inference_model(path, vocab, self.buckets)
+        return InferenceModel(model, vocab.max_len, self.buckets, forward=forward)
+
+
+def build_shared_model(config, layers):
+    """Rebuild a Keras model that computes straight from shared weight arrays.
+
+    The model is built from its config inside a keras.StatelessScope that
+    leaves its variables uninitialized, so no private copy of the weights
+    is ever allocated. Each array is wrapped in a tensor over the same memory
+    through DLPack, and the returned forward(rows) runs the model in a
+    scope that maps each variable to its tensor. Needs Keras 3.
+
+    Returns (model, forward).
+    """
+    import tensorflow as tf
+    try:
+        import keras
+        StatelessScope = keras.StatelessScope
+    except (ImportError, AttributeError):
+        raise ImportError("shared weights need Keras 3")
+    from model import PaddingMask
+
+    # a checkpoint saved as .h5 names its top-level class without a module
+    with StatelessScope(initialize_variables=False):
+        model = keras.models.model_from_json(
+            config, custom_objects={"Functional": keras.Model, "Sequential": keras.Sequential,
+                                    "PaddingMask": PaddingMask})
+
+    arrays = dict(layers)
+    values = {}
+    for layer in model.layers:
+        weights = arrays.get(layer.name, [])
+        if len(weights) != len(layer.weights):
+            raise ValueError(f"Layer {layer.name} has {len(layer.weights)} weights, "
+                             f"the shared export has {len(weights)}")
+        for variable, array in zip(layer.weights, weights):
+            if tuple(variable.shape) != array.shape:
+                raise ValueError(f"Weight {variable.path} has shape {tuple(variable.shape)}, "
+                                 f"the shared export has {array.shape}")
+            values[id(variable)] = tf.experimental.dlpack.from_dlpack(array.__dlpack__())
+
+    # what checkpoints do not save, such as dropout seeds, is not read at
+    # inference; small zero tensors stand in for it
+    mapping = [(v, values[id(v)] if id(v) in values else tf.zeros(v.shape, v.dtype))
+               for v in model.variables]
+
+    def forward(rows):
+        # the model reads every variable from the mapping; unlike
+        # Model.stateless_call, the scope does not initialize them on exit
+        with StatelessScope(state_mapping=mapping, initialize_variables=False):
+            return model(rows, training=False)
+
+    return model, forward
+
+
+def process_memory(pid="self"):
+    """Resident memory of a process in MB, by what backs it (Linux /proc only).
+
+    rss_file_mb covers pages mapped from files, such as a shared store, and
+    pss_mb charges each shared page to its processes in equal parts.
+    """
+    fields = {"VmRSS": "rss_mb", "RssAnon": "rss_anon_mb",
+              "RssFile": "rss_file_mb", "RssShmem": "rss_shmem_mb"}
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    memory[fields[key]] = int(value.split()[0]) / 1024
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "Pss":
+                    memory["pss_mb"] = int(value.split()[0]) / 1024
+    except (OSError, ValueError):
+        pass
+    return memory
+
+
+class PredictionCache:
+    """LRU cache of model outputs keyed on the preprocessed review text.
+
+    Keys are the output of clean_text + tokenize_and_lemmatize joined by
+    spaces, paired with the served model's version (see artifact_version),
+    so raw strings that only differ in case, punctuation, markup or
+    inflection share one entry. A retrained model or new vocabulary gets a
+    new version, so its lookups never see the old entries, which age out
+    through the LRU order. Entries expire after ttl seconds (None keeps
+    them until evicted, 0 turns the cache off like max_size=0).
+    """
+
+    def __init__(self, max_size=10000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._table = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._table)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._table.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._table.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._table[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_size <= 0 or (self.ttl is not None and self.ttl <= 0):
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._table[key] = (value, expires)
+            self._table.move_to_end(key)
+            while len(self._table) > self.max_size:
+                self._table.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._table.clear()
+            self.hits = 0
+            self.misses = 0
+            self.expired = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._table),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+        }
+
+
+def predict_cached(texts, version, cache, preprocess, predict):
+    """Label texts like /predict/batch, running the model on cache misses only.
+
+    preprocess(texts) returns the preprocessed texts and predict(texts) one
+    sigmoid output per preprocessed text. Outputs are cached on (version,
+    preprocessed text), each distinct text is looked up once and all misses
+    are scored in one predict call. Returns one result dict per input text.
+    """
+    processed = preprocess(texts)
+
+    predictions = {}
+    for text in processed:
+        if text not in predictions:
+            predictions[text] = cache.get((version, text))
+
+    misses = [text for text, prediction in predictions.items() if prediction is None]
+    if misses:
+        for text, prediction in zip(misses, predict(misses)):
+            predictions[text] = float(prediction)
+            cache.put((version, text), predictions[text])
+
+    results = []
+    for text in processed:
+        sentiment, confidence = label_prediction(predictions[text])
+        results.append({"sentiment": sentiment, "confidence": confidence})
+    return results
+
+
+def label_prediction(prediction):
+    """Turn a sigmoid output into the sentiment and confidence the API returns."""
+    prediction = float(prediction)
+    if prediction > 0.5:
+        return "Positive", prediction
+    return "Negative", 1 - prediction
+
+
+def read_batch_texts(payload):
+    """Pull the texts out of a /predict/batch JSON body.
+
+    Accepts either a bare list of strings or {"texts": [...]}.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get("texts")
+    if not isinstance(payload, list):
+        raise ValueError('Expected a list of texts or {"texts": [...]}')
+    for i, text in enumerate(payload):
+        if not isinstance(text, str):
+            raise ValueError(f"Item {i} is not a string")
+    return payload
+
+
+def iter_ndjson_lines(lines, start=1):
+    """Yield (line number, text, error) for every non-blank NDJSON line.
+
+    A line holds a JSON string or {"text": ...}. For a line that does not,
+    text is None and error says why, so the caller can answer it in place
+    and go on with the next line. start is the number of the first line,
+    for when a body is parsed a chunk at a time.
+    """
+    for line_number, line in enumerate(lines, start):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield line_number, None, f"Line {line_number} is not valid JSON"
+            continue
+        if isinstance(item, dict):
+            item = item.get("text")
+        if not isinstance(item, str):
+            yield line_number, None, f"Line {line_number} has no text"
+            continue
+        yield line_number, item, None
+
+
+def ndjson_answers(items, results):
+    """One answer per item of iter_ndjson_lines, in input order.
+
+    results holds one result per valid line; a bad line gets an error
+    object with its line number instead.
+    """
+    results = iter(results)
+    return [next(results) if error is None else {"line": line_number, "error": error, "success": False}
+            for line_number, _, error in items]
+
+
+def iter_ndjson_answers(lines, predict_texts, batch_size):
+    """Answer an NDJSON body line by line, batch_size lines per predict_texts call."""
+    for items in chunked(iter_ndjson_lines(lines), batch_size):
+        texts = [text for _, text, error in items if error is None]
+        yield from ndjson_answers(items, predict_texts(texts) if texts else [])
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def percentile_ms(samples, q):
+    if not samples:
+        return 0.0
+    return float(np.percentile(np.asarray(samples), q) * 1000)
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one batched call.
+
+    Each caller submits one encoded row. A background thread waits at most
+    max_wait_ms after the first queued row for others to join (or until
+    max_batch_size rows are queued), runs predict_fn once on the stacked
+    rows and hands every caller its own output. Rows submitted with their
+    own predict_fn (one per served model) are grouped and run per model.
+    With an executor, the forward passes run there instead of on the
+    batching thread.
+    """
+
+    def __init__(self, predict_fn=None, max_batch_size=32, max_wait_ms=5.0,
+                 latency_window=1000, executor=None):
+        self.predict_fn = predict_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        # recent end-to-end and forward-pass latencies, in seconds
+        self._latencies = deque(maxlen=latency_window)
+        self._predict_times = deque(maxlen=latency_window)
+        self.requests = 0
+        self.batches = 0
+
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, row, predict_fn=None):
+        predict_fn = predict_fn or self.predict_fn
+        if predict_fn is None:
+            raise ValueError("No predict_fn given for this row or the batcher")
+        future = Future()
+        self._queue.put((row, future, time.perf_counter(), predict_fn))
+        return future
+
+    def predict(self, row, timeout=None, predict_fn=None):
+        return self.submit(row, predict_fn).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    # past the deadline, only take rows that are already waiting
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[3], []).append(item)
+            for predict_fn, group in groups.items():
+                self._run_group(predict_fn, group)
+
+    def _run_group(self, predict_fn, group):
+        rows = np.stack([row for row, _, _, _ in group])
+        predict_start = time.perf_counter()
+        try:
+            if self.executor is not None:
+                outputs = self.executor.submit(predict_fn, rows).result()
+            else:
+                outputs = predict_fn(rows)
+        except Exception as e:
+            for _, future, _, _ in group:
+                future.set_exception(e)
+            return
+        done = time.perf_counter()
+
+        for (_, future, _, _), output in zip(group, outputs):
+            future.set_result(output)
+
+        with self._lock:
+            self.requests += len(group)
+            self.batches += 1
+            self._batch_sizes[len(group)] += 1
+            self._predict_times.append(done - predict_start)
+            self._latencies.extend(done - submitted for _, _, submitted, _ in group)
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            predict_times = list(self._predict_times)
+            histogram = dict(sorted(self._batch_sizes.items()))
+            requests, batches = self.requests, self.batches
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": requests,
+            "batches": batches,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "batch_size_histogram": histogram,
+            "latency_ms": {
+                "p50": percentile_ms(latencies, 50),
+                "p90": percentile_ms(latencies, 90),
+                "p99": percentile_ms(latencies, 99),
+            },
+            "predict_ms": {
+                "p50": percentile_ms(predict_times, 50),
+                "p99": percentile_ms(predict_times, 99),
+            },
+        }
@@ -0,0 +1,324 @@
+# sweep.py
+# Hyperparameter sweeps over the model builders, with early trial pruning
+
+import json
+import math
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import numpy as np
+from tensorflow.keras.callbacks import Callback
+
+from train import (
+    MODEL_BUILDERS, ArrayBatches, prepare_training_data, shared_training_directory,
+    load_shared_training_data, init_training_worker
+)
+
+# a search space maps parameter names to
+#   [a, b, c]             one of the listed values
+#   (low, high)           uniform; integers if both bounds are ints
+#   (low, high, 'log')    log-uniform, e.g. for the learning rate
+# Every key except batch_size is passed to the model builder.
+SEARCH_SPACES = {
+    'lstm': {
+        'embedding_dim': [64, 128, 256],
+        'lstm_units': [32, 64, 128],
+        'dense_units': [32, 64, 128],
+        'dropout': (0.2, 0.6),
+        'learning_rate': (1e-4, 3e-3, 'log'),
+        'batch_size': [32, 64],
+    },
+    'cnn': {
+        'embedding_dim': [64, 128, 256],
+        'filters': [64, 128, 256],
+        'kernel_size': [3, 5, 7],
+        'dense_units': [32, 64, 128],
+        'dropout': (0.2, 0.6),
+        'learning_rate': (1e-4, 3e-3, 'log'),
+        'batch_size': [32, 64],
+    },
+    'hybrid': {
+        'embedding_dim': [64, 128, 256],
+        'filters': [32, 64, 128],
+        'kernel_size': [3, 5, 7],
+        'lstm_units': [16, 32, 64],
+        'dense_units': [32, 64, 128],
+        'dropout': (0.2, 0.6),
+        'learning_rate': (1e-4, 3e-3, 'log'),
+        'batch_size': [32, 64],
+    },
+}
+TRAINING_PARAMS = ('batch_size',)
+
+
+def get_sweeps_directory():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(os.path.dirname(current_dir), 'sweeps')
+
+
+def sample_params(space, rng):
+    params = {}
+    for name, choice in sorted(space.items()):
+        if isinstance(choice, list):
+            value = choice[rng.integers(len(choice))]
+        elif len(choice) == 3 and choice[2] == 'log':
+            value = float(math.exp(rng.uniform(math.log(choice[0]), math.log(choice[1]))))
+        elif isinstance(choice[0], int) and isinstance(choice[1], int):
+            value = int(rng.integers(choice[0], choice[1] + 1))
+        else:
+            value = float(rng.uniform(choice[0], choice[1]))
+        # plain Python values, so they round-trip through JSON
+        params[name] = value.item() if isinstance(value, np.generic) else value
+    return params
+
+
+def rung_epochs(min_epochs, max_epochs, eta):
+    """Epochs at which trials are compared: min_epochs * eta**k below max_epochs."""
+    rungs = []
+    epoch = min_epochs
+    while epoch < max_epochs:
+        rungs.append(epoch)
+        epoch *= eta
+    return rungs
+
+
+class SweepStore:
+    """SQLite record of one sweep: its settings, trials and per-epoch reports.
+
+    Every trial process writes its own reports, and the pruning decision
+    reads everyone else's, so the database is the only shared state. A
+    sweep started again with the same file picks up where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS trials (
+                    id INTEGER PRIMARY KEY, params TEXT, state TEXT, epochs INTEGER,
+                    best_val_loss REAL, best_val_accuracy REAL, started REAL, finished REAL
+                );
+                CREATE TABLE IF NOT EXISTS reports (
+                    trial_id INTEGER, epoch INTEGER, val_loss REAL, val_accuracy REAL,
+                    PRIMARY KEY (trial_id, epoch)
+                );
+            ''')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    def check_settings(self, settings):
+        """Store the sweep settings, or raise if the file belongs to a different sweep."""
+        with closing(self._connect()) as conn, conn:
+            stored = dict(conn.execute('SELECT key, value FROM settings'))
+            if not stored:
+                conn.executemany('INSERT INTO settings VALUES (?, ?)',
+                                 [(key, json.dumps(value)) for key, value in settings.items()])
+                return
+        for key, value in settings.items():
+            if key in stored and json.loads(stored[key]) != json.loads(json.dumps(value)):
+                raise ValueError(f"{self.path} holds a sweep with a different {key}: {stored[key]}")
+
+    def add_trial(self, params):
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute("INSERT INTO trials (params, state) VALUES (?, 'pending')",
+                                  (json.dumps(params),))
+            return cursor.lastrowid
+
+    def reset_interrupted(self):
+        """Queue trials that were running when the last sweep stopped to run again."""
+        with closing(self._connect()) as conn, conn:
+            interrupted = [row[0] for row in conn.execute("SELECT id FROM trials WHERE state = 'running'")]
+            conn.executemany('DELETE FROM reports WHERE trial_id = ?', [(i,) for i in interrupted])
+            conn.execute("UPDATE trials SET state = 'pending', started = NULL WHERE state = 'running'")
+        return interrupted
+
+    def start(self, trial_id):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE trials SET state = 'running', started = ? WHERE id = ?",
+                         (time.time(), trial_id))
+
+    def finish(self, trial_id, state, epochs, best_val_loss, best_val_accuracy):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('UPDATE trials SET state = ?, epochs = ?, best_val_loss = ?, '
+                         'best_val_accuracy = ?, finished = ? WHERE id = ?',
+                         (state, epochs, best_val_loss, best_val_accuracy, time.time(), trial_id))
+
+    def report(self, trial_id, epoch, val_loss, val_accuracy):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)',
+                         (trial_id, epoch, val_loss, val_accuracy))
+
+    def losses_at(self, epoch):
+        with closing(self._connect()) as conn:
+            return {trial_id: loss for trial_id, loss in
+                    conn.execute('SELECT trial_id, val_loss FROM reports WHERE epoch = ?', (epoch,))}
+
+    def trials(self, state=None):
+        query = 'SELECT id, params, state, epochs, best_val_loss, best_val_accuracy, started, finished FROM trials'
+        args = ()
+        if state:
+            query += ' WHERE state = ?'
+            args = (state,)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query + ' ORDER BY id', args).fetchall()
+        columns = ['id', 'params', 'state', 'epochs', 'best_val_loss', 'best_val_accuracy',
+                   'started', 'finished']
+        trials = [dict(zip(columns, row)) for row in rows]
+        for trial in trials:
+            trial['params'] = json.loads(trial['params'])
+        return trials
+
+    def export_csv(self, path):
+        import csv
+
+        trials = self.trials()
+        names = sorted({name for trial in trials for name in trial['params']})
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'state', 'epochs', 'best_val_loss', 'best_val_accuracy'] + names)
+            for trial in trials:
+                writer.writerow([trial['id'], trial['state'], trial['epochs'], trial['best_val_loss'],
+                                 trial['best_val_accuracy']] + [trial['params'].get(n) for n in names])
+        return path
+
+
+def should_prune(losses, trial_id, eta):
+    """ASHA rule: continue only if among the best 1/eta of the trials that reached this rung.
+
+    Until eta trials have reported at a rung there is nothing to compare
+    against, and the trial goes on.
+    """
+    keep = len(losses) // eta
+    if keep == 0:
+        return False
+    cutoff = sorted(losses.values())[keep - 1]
+    return losses[trial_id] > cutoff
+
+
+class PruningCallback(Callback):
+    """Report val_loss every epoch and stop the trial at a rung it does not survive."""
+
+    def __init__(self, store, trial_id, rungs, eta):
+        super().__init__()
+        self.store = store
+        self.trial_id = trial_id
+        self.rungs = set(rungs)
+        self.eta = eta
+        self.pruned = False
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        epoch += 1
+        self.store.report(self.trial_id, epoch, float(logs['val_loss']), float(logs['val_accuracy']))
+        if epoch in self.rungs and should_prune(self.store.losses_at(epoch), self.trial_id, self.eta):
+            self.pruned = True
+            self.model.stop_training = True
+
+
+def run_trial(store_path, data_dir, model_name, trial_id, params, max_epochs, rungs, eta):
+    """Train one trial in a worker process until it finishes or is pruned."""
+    store = SweepStore(store_path)
+    store.start(trial_id)
+    data = load_shared_training_data(data_dir)
+
+    builder_params = {k: v for k, v in params.items() if k not in TRAINING_PARAMS}
+    batch_size = params.get('batch_size', 32)
+    model = MODEL_BUILDERS[model_name](data.vocab_size, data.encoder.max_len, **builder_params)
+
+    pruning = PruningCallback(store, trial_id, rungs, eta)
+    history = model.fit(
+        ArrayBatches(data.X_train, data.y_train, batch_size, shuffle=True),
+        validation_data=ArrayBatches(data.X_val, data.y_val, batch_size),
+        epochs=max_epochs,
+        callbacks=[pruning],
+        verbose=0
+    )
+
+    val_loss = history.history['val_loss']
+    best = int(np.argmin(val_loss))
+    state = 'pruned' if pruning.pruned else 'complete'
+    store.finish(trial_id, state, len(val_loss), float(val_loss[best]),
+                 float(history.history['val_accuracy'][best]))
+    return trial_id, state, len(val_loss), float(val_loss[best])
+
+
+def run_sweep(model_name, space=None, n_trials=20, max_epochs=9, min_epochs=1, eta=3,
+              n_jobs=None, name=None, seed=42, data=None, directory=None):
+    """Sample n_trials configurations of one architecture and train them with pruning.
+
+    Trials run concurrently in a spawned process pool, each on the shared
+    memory-mapped split (as in train_parallel). After every epoch a trial
+    records its validation loss; at each rung (min_epochs * eta**k epochs)
+    it stops unless it is in the best 1/eta of the trials that got there,
+    so most of the budget goes to promising configurations.
+
+    Everything is recorded in sweeps/<name>.sqlite (or under directory),
+    with a CSV copy of the trials next to it. Calling run_sweep again
+    with the same name resumes: finished trials are kept, interrupted ones
+    rerun, and new trials are added up to n_trials. Parameters come from a
+    seed per trial index, so a resumed sweep samples what the first run
+    would have.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    if model_name not in MODEL_BUILDERS:
+        raise ValueError(f"Unknown model {model_name!r}, choose from {sorted(MODEL_BUILDERS)}")
+    space = space or SEARCH_SPACES[model_name]
+    name = name or f'{model_name}_sweep'
+    directory = directory or get_sweeps_directory()
+    store = SweepStore(os.path.join(directory, f'{name}.sqlite'))
+    store.check_settings({'model': model_name, 'space': space, 'seed': seed,
+                          'max_epochs': max_epochs, 'min_epochs': min_epochs, 'eta': eta})
+
+    interrupted = store.reset_interrupted()
+    if interrupted:
+        print(f"Rerunning interrupted trials {interrupted}")
+    existing = len(store.trials())
+    for index in range(existing, n_trials):
+        store.add_trial(sample_params(space, np.random.default_rng([seed, index])))
+
+    pending = store.trials('pending')
+    rungs = rung_epochs(min_epochs, max_epochs, eta)
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(pending) or 1))
+    threads = max(1, (os.cpu_count() or 1) // n_jobs)
+    print(f"Sweep {name}: {len(pending)} trials to run, {n_jobs} at a time, "
+          f"up to {max_epochs} epochs, rungs at {rungs}")
+
+    if pending:
+        data = data or prepare_training_data()
+        if data is None:
+            return None
+        with shared_training_directory(data) as data_dir:
+            with ProcessPoolExecutor(n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=init_training_worker, initargs=(threads,)) as pool:
+                futures = [pool.submit(run_trial, store.path, data_dir, model_name, trial['id'],
+                                       trial['params'], max_epochs, rungs, eta)
+                           for trial in pending]
+                for future in as_completed(futures):
+                    trial_id, state, epochs, val_loss = future.result()
+                    print(f"Trial {trial_id}: {state} after {epochs} epochs, "
+                          f"best val_loss {val_loss:.4f}")
+
+    csv_path = store.export_csv(os.path.join(directory, f'{name}.csv'))
+    trials = store.trials()
+    print_leaderboard(trials)
+    print(f"Results saved to {store.path} and {csv_path}")
+    return trials
+
+
+def print_leaderboard(trials, top=5):
+    finished = [t for t in trials if t['state'] in ('complete', 'pruned')]
+    # trials that ran to the end first, then by validation loss
+    ranked = sorted(finished, key=lambda t: (t['state'] != 'complete', t['best_val_loss']))
+    epochs = sum(t['epochs'] or 0 for t in finished)
+    pruned = sum(t['state'] == 'pruned' for t in finished)
+    print(f"\n{len(finished)} trials, {pruned} pruned, {epochs} epochs trained in total")
+    for trial in ranked[:top]:
+        print(f"#{trial['id']:<4} {trial['state']:<9} val_loss {trial['best_val_loss']:.4f}  "
+              f"val_acc {trial['best_val_accuracy']:.4f}  {json.dumps(trial['params'])}")
@@ -6,29 +6,207 @@ import numpy as np
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
 
-from preprocessing import load_labelled_reviews, TextPreprocessor, remove_outliers
-from feature_engineering import TextEncoder
-from model import create_lstm_model
+from preprocessing import load_preprocessed_corpus, remove_outliers
+from feature_engineering import (
+    TextEncoder, write_model_metadata, load_vocabulary, save_encoded_dataset,
+    load_encoded_dataset, get_encoded_dataset_directory, get_vocab_path
+)
+from model import create_lstm_model, create_cnn_model, create_hybrid_model
+from quantization import export_quantized
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
+from tensorflow.keras.utils import Sequence
 import matplotlib.pyplot as plt
+import json
+import tempfile
+import time
+from contextlib import contextmanager
 
-def train_lstm():
-    print("Starting LSTM training...")
-    
-    # load data
+MODEL_BUILDERS = {
+    'lstm': create_lstm_model,
+    'cnn': create_cnn_model,
+    'hybrid': create_hybrid_model,
+}
+MODEL_LABELS = {'lstm': 'LSTM', 'cnn': 'CNN', 'hybrid': 'Hybrid'}
+
+# everything train_model and train_models read; pass a dict with any of
+# these keys to override them
+DEFAULT_TRAINING_CONFIG = {
+    'max_words': 10000,
+    'max_len': 200,
+    'batch_size': 32,
+    'epochs': 30,
+    'bucketed': False,
+    'early_stopping_patience': 5,
+    'reduce_lr_factor': 0.5,
+    'reduce_lr_patience': 3,
+    'min_lr': 0.00001,
+    # extra Keras callbacks, added after the three above
+    'callbacks': [],
+    'models_dir': 'models',
+    'save_final': True,
+    # int8/float16 .tflite exports after training; each unrolls the model
+    # and converts it twice, which takes minutes per model (opt in)
+    'quantize': False,
+    'plots': True,
+    'verbose': 1,
+    # slice batches from the arrays instead of handing them to fit whole,
+    # so memory-mapped splits stay shared (set for parallel runs)
+    'streamed': False,
+    # write the encoded split to artifacts/encoded/ after preparing it, and
+    # train from that export instead of re-encoding the corpus
+    'save_encoded': True,
+    'from_encoded': False,
+}
+
+def training_config(config=None):
+    return dict(DEFAULT_TRAINING_CONFIG, **(config or {}))
+
+# bucket_by_sequence_length boundaries: a batch of reviews shorter than 16
+# tokens is padded to 15, and so on; the last bucket pads to the full MAX_LEN
+TRAIN_BUCKET_BOUNDARIES = (16, 32, 64, 128)
+
+def sequence_lengths(X):
+    # post-padded, so a row's length is its number of non-zero ids
+    return np.count_nonzero(X, axis=1)
+
+def make_dataset(X, y, batch_size=32, shuffle=False, boundaries=TRAIN_BUCKET_BOUNDARIES, seed=42,
+                 streamed=False):
+    """tf.data pipeline that batches reviews of similar length together.
+
+    Rows are cut back to their true length and grouped by
+    bucket_by_sequence_length, so each batch is only padded to its bucket
+    boundary instead of the full width of X. This is not the same training
+    as on padded arrays: the batches hold different rows and come in a
+    different order, and the CNN and hybrid convolutions (which see the
+    padding, unlike the masked LSTMs) pool over fewer padding positions.
+    bench_training.py measures the effect on epoch time and accuracy.
+
+    With streamed=True the rows are read from X one at a time by a
+    generator instead of being copied into the pipeline as one tensor, so
+    a memory-mapped split stays shared between processes.
+    """
+    import tensorflow as tf
+
+    max_len = X.shape[1]
+    boundaries = [b for b in boundaries if b <= max_len] + [max_len + 1]
+
+    if streamed:
+        rng = np.random.default_rng(seed)
+
+        def rows():
+            for i in rng.permutation(len(X)) if shuffle else range(len(X)):
+                row = np.asarray(X[i], dtype=np.int32)
+                yield row[:np.count_nonzero(row)], y[i]
+
+        dataset = tf.data.Dataset.from_generator(rows, output_signature=(
+            tf.TensorSpec([None], tf.int32), tf.TensorSpec([], tf.as_dtype(y.dtype))))
+    else:
+        dataset = tf.data.Dataset.from_tensor_slices((X.astype(np.int32), sequence_lengths(X), y))
+        if shuffle:
+            dataset = dataset.shuffle(len(X), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.map(lambda row, length, label: (row[:length], label),
+                              num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = dataset.bucket_by_sequence_length(
+        lambda row, label: tf.shape(row)[0],
+        bucket_boundaries=boundaries,
+        bucket_batch_sizes=[batch_size] * (len(boundaries) + 1),
+        padded_shapes=([None], []),
+        # at least the first boundary - 1 wide, so Conv1D windows always fit
+        pad_to_bucket_boundary=True,
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+class ArrayBatches(Sequence):
+    """Batches sliced from (possibly memory-mapped) arrays one step at a time.
+
+    model.fit on NumPy arrays first converts them to one tensor, a private
+    copy in every process. Slicing per step keeps memory-mapped splits
+    shared; only the current batch is copied.
+    """
+
+    def __init__(self, X, y, batch_size=32, shuffle=False, seed=42):
+        super().__init__()
+        self.X, self.y = X, y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+        self._order = np.arange(len(X))
+        if shuffle:
+            self._rng.shuffle(self._order)
+
+    def __len__(self):
+        return (len(self.X) + self.batch_size - 1) // self.batch_size
+
+    def __getitem__(self, i):
+        # sorted, so a memory-mapped read moves forward through the file
+        index = np.sort(self._order[i * self.batch_size:(i + 1) * self.batch_size])
+        return np.asarray(self.X[index], dtype=np.int32), np.asarray(self.y[index])
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self._rng.shuffle(self._order)
+
+def fit_inputs(X_train, y_train, X_val, y_val, batch_size=32, bucketed=False, streamed=False):
+    """The data arguments for model.fit, as padded arrays, bucketed datasets or streamed batches."""
+    if streamed and not bucketed:
+        return {
+            'x': ArrayBatches(X_train, y_train, batch_size, shuffle=True),
+            'validation_data': ArrayBatches(X_val, y_val, batch_size),
+        }
+    if not bucketed:
+        return {
+            'x': X_train, 'y': y_train,
+            'batch_size': batch_size,
+            'validation_data': (X_val, y_val),
+        }
+    return {
+        'x': make_dataset(X_train, y_train, batch_size, shuffle=True, streamed=streamed),
+        'validation_data': make_dataset(X_val, y_val, batch_size, streamed=streamed),
+    }
+
+class TrainingData:
+    """The encoded splits and the encoder, prepared once and shared by every model."""
+
+    def __init__(self, encoder, X_train, X_val, X_test, y_train, y_val, y_test, directory=None):
+        self.encoder = encoder
+        self.X_train, self.X_val, self.X_test = X_train, X_val, X_test
+        self.y_train, self.y_val, self.y_test = y_train, y_val, y_test
+        # set when the splits are memory-mapped from an encoded dataset
+        self.directory = directory
+
+    @classmethod
+    def from_encoded(cls, dataset):
+        encoder = TextEncoder(max_words=dataset.vocab.max_words, max_len=dataset.vocab.max_len)
+        encoder.vocab = dataset.vocab
+        return cls(encoder, *dataset.splits(), directory=dataset.directory)
+
+    @property
+    def vocab_size(self):
+        return min(len(self.encoder.vocab) + 1, self.encoder.max_words)
+
+    def splits(self):
+        return self.X_train, self.X_val, self.X_test, self.y_train, self.y_val, self.y_test
+
+def prepare_training_data(config=None):
+    """Load the corpus, fit and save the vocabulary and split the data, once.
+
+    With from_encoded, the split saved by an earlier run is memory-mapped
+    from artifacts/encoded/ instead; with save_encoded, a freshly prepared
+    split is saved there.
+    """
+    config = training_config(config)
+    if config['from_encoded']:
+        return load_encoded_training_data(config)
+
+    # load and preprocess data (cached on disk after the first run)
     print("\nLoading data...")
-    reviews, labels = load_labelled_reviews()
+    processed_reviews, labels = load_preprocessed_corpus()
     
-    if len(reviews) == 0:
+    if len(processed_reviews) == 0:
         print("No data found!")
-        return
-    
-    print(f"Loaded {len(reviews)} reviews")
+        return None
     
-    # preprocess
-    print("\nPreprocessing...")
-    preprocessor = TextPreprocessor()
-    processed_reviews = preprocessor.preprocess_reviews(reviews)
+    print(f"Loaded {len(processed_reviews)} reviews")
     
     # remove outliers
     processed_reviews, labels = remove_outliers(processed_reviews, labels)
@@ -36,79 +214,286 @@ def train_lstm():
     
     # encode text
     print("\nEncoding text...")
-    encoder = TextEncoder(max_words=10000, max_len=200)
+    encoder = TextEncoder(max_words=config['max_words'], max_len=config['max_len'])
     encoder.fit_tokenizer(processed_reviews)
     
     # prepare datasets
-    X_train, X_val, X_test, y_train, y_val, y_test = encoder.prepare_data(
-        processed_reviews, labels
-    )
+    data = TrainingData(encoder, *encoder.prepare_data(processed_reviews, labels))
+    if config['save_encoded']:
+        directory = save_encoded_dataset(data.splits(), encoder.vocab,
+                                         split_settings=encoder.split_settings,
+                                         split_indices=encoder.split_indices)
+        print(f"Saved encoded dataset to {directory}")
+    return data
+
+def load_encoded_training_data(config=None, directory=None):
+    """Memory-map the split saved by prepare_training_data.
+
+    Models trained on the split must be served with the vocabulary it was
+    encoded with. artifacts/vocab.bin is written from the saved copy when
+    it is missing, and a ValueError is raised when it holds a different
+    vocabulary; it is never overwritten.
+    """
+    config = training_config(config)
+    directory = directory or get_encoded_dataset_directory()
+    dataset = load_encoded_dataset(directory)
+    if dataset is None:
+        raise FileNotFoundError(f"No encoded dataset in {directory}, train once without from_encoded")
+
+    vocab = dataset.vocab
+    if (vocab.max_words, vocab.max_len) != (config['max_words'], config['max_len']):
+        raise ValueError(f"Encoded dataset uses max_words={vocab.max_words}, max_len={vocab.max_len}; "
+                         f"config asks for {config['max_words']}, {config['max_len']}")
+    current = load_vocabulary()
+    if current is None:
+        vocab_path = vocab.save()
+        print(f"Saved vocabulary {vocab.vocab_hash} from {directory} to {vocab_path}")
+    elif current.vocab_hash != vocab.vocab_hash:
+        raise ValueError(f"{get_vocab_path()} holds vocabulary {current.vocab_hash}, but the encoded "
+                         f"dataset in {directory} was saved with {vocab.vocab_hash}; train once "
+                         f"without from_encoded to encode the corpus with the current vocabulary")
+
+    print(f"Loaded encoded dataset from {directory} ({len(dataset.y_train)} training samples)")
+    return TrainingData.from_encoded(dataset)
+
+def train_model(name, data, config=None):
+    """Train one architecture from MODEL_BUILDERS on prepared data.
+
+    Writes models/best_<name>.h5 (best validation accuracy) stamped with the
+    vocabulary, optionally models/<name>_final.h5 and the quantized exports,
+    and the training history and confusion matrix plots. Returns a summary
+    dict for the comparison report, with the model and history attached.
+    """
+    config = training_config(config)
+    label = MODEL_LABELS.get(name, name)
+    print(f"Starting {label} training...")
     
     # create model
-    print("\nCreating LSTM model...")
-    vocab_size = min(len(encoder.tokenizer.word_index) + 1, 10000)
-    model = create_lstm_model(vocab_size, 200)
+    print(f"\nCreating {label} model...")
+    model = MODEL_BUILDERS[name](data.vocab_size, config['max_len'])
     
     print("\nModel summary:")
     model.summary()
     
     # callbacks
-    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    early_stop = EarlyStopping(monitor='val_loss', patience=config['early_stopping_patience'],
+                               restore_best_weights=True)
     
     reduce_lr = ReduceLROnPlateau(
         monitor='val_loss',
-        factor=0.5,
-        patience=3,
-        min_lr=0.00001
+        factor=config['reduce_lr_factor'],
+        patience=config['reduce_lr_patience'],
+        min_lr=config['min_lr']
     )
     
     # create models folder if not exists
-    if not os.path.exists('models'):
-        os.makedirs('models')
+    models_dir = config['models_dir']
+    os.makedirs(models_dir, exist_ok=True)
+    checkpoint_path = os.path.join(models_dir, f'best_{name}.h5')
     
     checkpoint = ModelCheckpoint(
-        'models/best_lstm.h5',
+        checkpoint_path,
         monitor='val_accuracy',
         save_best_only=True,
         mode='max'
     )
     
     # train
-    print("\nTraining model...")
+    print(f"\nTraining {label} model...")
+    start = time.perf_counter()
     history = model.fit(
-        X_train, y_train,
-        batch_size=32,
-        epochs=30,  # increased from 10
-        validation_data=(X_val, y_val),
-        callbacks=[early_stop, reduce_lr, checkpoint],
-        verbose=1
+        **fit_inputs(data.X_train, data.y_train, data.X_val, data.y_val,
+                     config['batch_size'], config['bucketed'], config['streamed']),
+        epochs=config['epochs'],
+        callbacks=[early_stop, reduce_lr, checkpoint] + list(config['callbacks']),
+        verbose=config['verbose']
     )
+    train_time = time.perf_counter() - start
     
     # evaluate on test set
     print("\nEvaluating on test set...")
-    test_loss, test_acc, test_auc = model.evaluate(X_test, y_test)
+    if config['streamed']:
+        test_data = {'x': ArrayBatches(data.X_test, data.y_test, config['batch_size'])}
+    else:
+        test_data = {'x': data.X_test, 'y': data.y_test}
+    test_loss, test_acc, test_auc = model.evaluate(**test_data, verbose=config['verbose'])
     print(f"Test accuracy: {test_acc:.4f}")
     print(f"Test loss: {test_loss:.4f}")
     print(f"Test AUC: {test_auc:.4f}")
     
-    # plot training history
-    plot_training_history(history, 'lstm_training_history.png')
-    
-    # evaluate model and generate confusion matrix
-    from evaluation import evaluate_model
-    print("\nGenerating LSTM evaluation metrics...")
-    evaluate_model(model, X_test, y_test, encoder)
-    
-    # rename confusion matrix for LSTM
-    import shutil
-    if os.path.exists('confusion_matrix.png'):
-        shutil.move('confusion_matrix.png', 'lstm_confusion_matrix.png')
-        print("LSTM confusion matrix saved to lstm_confusion_matrix.png")
-    
-    print("\nTraining complete!")
-    print("Model saved to models/best_lstm.h5")
-    
-    return model, history
+    # save final model
+    if config['save_final']:
+        final_path = os.path.join(models_dir, f'{name}_final.h5')
+        model.save(final_path)
+        write_model_metadata(final_path, data.encoder.vocab)
+    
+    if config['plots']:
+        # plot training history
+        plot_training_history(history, f'{name}_training_history.png')
+        
+        # evaluate model and generate confusion matrix
+        from evaluation import evaluate_model
+        print(f"\nGenerating {label} evaluation metrics...")
+        evaluate_model(model, data.X_test, data.y_test, data.encoder,
+                       filename=f'{name}_confusion_matrix.png')
+    
+    print(f"\n{label} Training complete!")
+    print(f"Model saved to {checkpoint_path}")
+    
+    # stamp the checkpoint with the vocabulary it was trained on
+    write_model_metadata(checkpoint_path, data.encoder.vocab)
+    
+    result = {
+        'model_name': name,
+        'checkpoint': checkpoint_path,
+        'parameters': model.count_params(),
+        'epochs_run': len(history.history['loss']),
+        'best_val_accuracy': max(history.history['val_accuracy']),
+        'test_loss': test_loss,
+        'test_accuracy': test_acc,
+        'test_auc': test_auc,
+        'train_time_s': train_time,
+    }
+    
+    # int8 and float16 exports for serving, checked against the float32 test accuracy;
+    # the checkpoint is already written, so a failed conversion does not fail the run
+    if config['quantize']:
+        try:
+            report = export_quantized(checkpoint_path, data.encoder.vocab, data.X_test, data.y_test)
+        except Exception as e:
+            print(f"Quantized export of {checkpoint_path} failed: {e}")
+            result['quantize_error'] = str(e)
+        else:
+            result['quantized_accuracy'] = {
+                suffix: entry['accuracy'] for suffix, entry in report.items()
+                if isinstance(entry, dict) and 'accuracy' in entry
+            }
+    
+    result['model'], result['history'] = model, history
+    return result
+
+def train_models(names=tuple(MODEL_BUILDERS), config=None, data=None, parallel=False, n_jobs=None):
+    """Prepare the data once, train each architecture on it and write one report.
+
+    By default the models train one after another in this process. With
+    parallel=True each one trains in its own process (see train_parallel).
+    """
+    config = training_config(config)
+    unknown = [name for name in names if name not in MODEL_BUILDERS]
+    if unknown:
+        raise ValueError(f"Unknown models {unknown}, choose from {sorted(MODEL_BUILDERS)}")
+    
+    data = data or prepare_training_data(config)
+    if data is None:
+        return None
+    
+    start = time.perf_counter()
+    if parallel and len(names) > 1:
+        results = train_parallel(names, data, config, n_jobs)
+    else:
+        results = [train_model(name, data, config) for name in names]
+    timing = {
+        'mode': 'parallel' if parallel and len(names) > 1 else 'sequential',
+        'wall_time_s': time.perf_counter() - start,
+        # time spent in fit, summed over the models
+        'sum_train_time_s': sum(result['train_time_s'] for result in results),
+    }
+    write_training_report(results, os.path.join(config['models_dir'], 'training_report.json'),
+                          config, timing)
+    return results
+
+def train_parallel(names, data, config=None, n_jobs=None):
+    """Train each architecture in its own process on one shared copy of the data.
+
+    The splits are written once as .npy files and every worker maps them
+    read-only, feeding fit with batches sliced per step (or, bucketed, with
+    rows read one at a time). The cores are split
+    evenly between the workers through TensorFlow's intra-op thread pool
+    (inter-op is kept at 1), so the runs do not oversubscribe the machine.
+    Workers are spawned, not forked, since this process already runs
+    TensorFlow. Extra callbacks cannot be sent to them.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    config = training_config(config)
+    if config['callbacks']:
+        raise ValueError("Extra callbacks cannot be sent to parallel training processes")
+    config = dict(config, streamed=True, verbose=2 if config['verbose'] else 0)
+
+    n_jobs = max(1, min(n_jobs or len(names), len(names)))
+    threads = max(1, (os.cpu_count() or 1) // n_jobs)
+    print(f"\nTraining {', '.join(names)} in {n_jobs} processes, {threads} threads each...")
+
+    with shared_training_directory(data) as directory:
+        with ProcessPoolExecutor(n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_training_worker, initargs=(threads,)) as pool:
+            futures = [pool.submit(_train_shared, name, directory, config) for name in names]
+            return [future.result() for future in futures]
+
+def share_training_data(data, directory):
+    """Write the splits and vocabulary to directory for load_shared_training_data."""
+    save_encoded_dataset(data.splits(), data.encoder.vocab, directory)
+
+def load_shared_training_data(directory):
+    return TrainingData.from_encoded(load_encoded_dataset(directory))
+
+@contextmanager
+def shared_training_directory(data):
+    """A directory holding data as an encoded dataset, for worker processes.
+
+    Data already mapped from an export is shared as is; anything else is
+    written to a temporary directory removed on exit.
+    """
+    if data.directory:
+        yield data.directory
+        return
+    with tempfile.TemporaryDirectory(prefix='training-data-') as directory:
+        share_training_data(data, directory)
+        yield directory
+
+def init_training_worker(threads):
+    import tensorflow as tf
+
+    # must happen before the first op starts the runtime
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    # nobody looks at plt.show() windows from a worker
+    plt.switch_backend('Agg')
+
+def _train_shared(name, directory, config):
+    result = train_model(name, load_shared_training_data(directory), config)
+    # the Keras objects stay here; the parent only needs the summary
+    del result['model']
+    result['history'] = result['history'].history
+    return result
+
+def write_training_report(results, path, config=None, timing=None):
+    """Save the per-model summaries as JSON and print them side by side."""
+    summaries = [{k: v for k, v in result.items() if k not in ('model', 'history')}
+                 for result in results]
+    report = {
+        'config': {k: v for k, v in training_config(config).items() if k != 'callbacks'},
+        'models': summaries,
+    }
+    if timing:
+        report['timing'] = timing
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=float)
+    
+    print("\nModel comparison:")
+    print(f"{'model':>8} {'params':>10} {'epochs':>7} {'val acc':>8} {'test acc':>9} "
+          f"{'test AUC':>9} {'time s':>8}")
+    for summary in sorted(summaries, key=lambda s: s['test_accuracy'], reverse=True):
+        print(f"{summary['model_name']:>8} {summary['parameters']:>10,} {summary['epochs_run']:>7} "
+              f"{summary['best_val_accuracy']:>8.4f} {summary['test_accuracy']:>9.4f} "
+              f"{summary['test_auc']:>9.4f} {summary['train_time_s']:>8.0f}")
+    if timing:
+        print(f"Wall time ({timing['mode']}): {timing['wall_time_s']:.0f}s, "
+              f"sum of training times: {timing['sum_train_time_s']:.0f}s")
+    print(f"Report saved to {path}")
+    return report
 
 def plot_training_history(history, filename='training_history.png'):
     # accuracy plot
@@ -143,216 +528,26 @@ def plot_history(history):
     # just call the new function
     plot_training_history(history)
 
-def train_cnn():
-    """Train CNN model for sentiment analysis"""
-    print("Starting CNN training...")
-    
-    # load data
-    print("\nLoading data...")
-    reviews, labels = load_labelled_reviews()
-    
-    if len(reviews) == 0:
-        print("No data found!")
+def _train_one(name, batch_size, bucketed, quantize):
+    config = training_config({'batch_size': batch_size, 'bucketed': bucketed,
+                              'quantize': quantize})
+    data = prepare_training_data(config)
+    if data is None:
         return
-    
-    print(f"Loaded {len(reviews)} reviews")
-    
-    # preprocess
-    print("\nPreprocessing...")
-    preprocessor = TextPreprocessor()
-    processed_reviews = preprocessor.preprocess_reviews(reviews)
-    
-    # remove outliers
-    processed_reviews, labels = remove_outliers(processed_reviews, labels)
-    print(f"After cleaning: {len(processed_reviews)} reviews")
-    
-    # encode text
-    print("\nEncoding text...")
-    encoder = TextEncoder(max_words=10000, max_len=200)
-    encoder.fit_tokenizer(processed_reviews)
-    
-    # prepare datasets
-    X_train, X_val, X_test, y_train, y_val, y_test = encoder.prepare_data(
-        processed_reviews, labels
-    )
-    
-    # import CNN model
-    from model import create_cnn_model
-    
-    # create model
-    print("\nCreating CNN model...")
-    vocab_size = min(len(encoder.tokenizer.word_index) + 1, 10000)
-    model = create_cnn_model(vocab_size, 200)
-    
-    print("\nModel summary:")
-    model.summary()
-    
-    # callbacks
-    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
-    
-    reduce_lr = ReduceLROnPlateau(
-        monitor='val_loss',
-        factor=0.5,
-        patience=3,
-        min_lr=0.00001
-    )
-    
-    # create models folder if not exists
-    if not os.path.exists('models'):
-        os.makedirs('models')
-    
-    checkpoint = ModelCheckpoint(
-        'models/best_cnn.h5',
-        monitor='val_accuracy',
-        save_best_only=True,
-        mode='max'
-    )
-    
-    # train
-    print("\nTraining CNN model...")
-    history = model.fit(
-        X_train, y_train,
-        batch_size=32,
-        epochs=30,
-        validation_data=(X_val, y_val),
-        callbacks=[early_stop, reduce_lr, checkpoint],
-        verbose=1
-    )
-    
-    # evaluate on test set
-    print("\nEvaluating on test set...")
-    test_loss, test_acc, test_auc = model.evaluate(X_test, y_test)
-    print(f"Test accuracy: {test_acc:.4f}")
-    print(f"Test loss: {test_loss:.4f}")
-    print(f"Test AUC: {test_auc:.4f}")
-    
-    # save final model
-    model.save('models/cnn_final.h5')
-    
-    # plot training history
-    plot_training_history(history, 'cnn_training_history.png')
-    
-    # evaluate model and generate confusion matrix
-    from evaluation import evaluate_model
-    print("\nGenerating CNN evaluation metrics...")
-    evaluate_model(model, X_test, y_test, encoder)
-    
-    # rename confusion matrix for CNN
-    import shutil
-    if os.path.exists('confusion_matrix.png'):
-        shutil.move('confusion_matrix.png', 'cnn_confusion_matrix.png')
-        print("CNN confusion matrix saved to cnn_confusion_matrix.png")
-    
-    print("\nCNN Training complete!")
-    print("Model saved to models/best_cnn.h5")
-    
-    return model, history
+    result = train_model(name, data, config)
+    return result['model'], result['history']
+
+def train_lstm(batch_size=32, bucketed=False, quantize=False):
+    return _train_one('lstm', batch_size, bucketed, quantize)
 
-def train_hybrid():
+def train_cnn(batch_size=32, bucketed=False, quantize=False):
+    """Train CNN model for sentiment analysis"""
+    return _train_one('cnn', batch_size, bucketed, quantize)
+
+def train_hybrid(batch_size=32, bucketed=False, quantize=False):
     """Train Hybrid CNN-LSTM model"""
-    print("Starting Hybrid model training...")
-    
-    # load data
-    print("\nLoading data...")
-    reviews, labels = load_labelled_reviews()
-    
-    if len(reviews) == 0:
-        print("No data found!")
-        return
-    
-    print(f"Loaded {len(reviews)} reviews")
-    
-    # preprocess
-    print("\nPreprocessing...")
-    preprocessor = TextPreprocessor()
-    processed_reviews = preprocessor.preprocess_reviews(reviews)
-    
-    # remove outliers
-    processed_reviews, labels = remove_outliers(processed_reviews, labels)
-    print(f"After cleaning: {len(processed_reviews)} reviews")
-    
-    # encode text
-    print("\nEncoding text...")
-    encoder = TextEncoder(max_words=10000, max_len=200)
-    encoder.fit_tokenizer(processed_reviews)
-    
-    # prepare datasets
-    X_train, X_val, X_test, y_train, y_val, y_test = encoder.prepare_data(
-        processed_reviews, labels
-    )
-    
-    # import hybrid model
-    from model import create_hybrid_model
-    
-    # create model
-    print("\nCreating Hybrid model...")
-    vocab_size = min(len(encoder.tokenizer.word_index) + 1, 10000)
-    model = create_hybrid_model(vocab_size, 200)
-    
-    print("\nModel summary:")
-    model.summary()
-    
-    # callbacks
-    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
-    
-    reduce_lr = ReduceLROnPlateau(
-        monitor='val_loss',
-        factor=0.5,
-        patience=3,
-        min_lr=0.00001
-    )
-    
-    # create models folder if not exists
-    if not os.path.exists('models'):
-        os.makedirs('models')
-    
-    checkpoint = ModelCheckpoint(
-        'models/best_hybrid.h5',
-        monitor='val_accuracy',
-        save_best_only=True,
-        mode='max'
-    )
-    
-    # train
-    print("\nTraining Hybrid model...")
-    history = model.fit(
-        X_train, y_train,
-        batch_size=32,
-        epochs=30,
-        validation_data=(X_val, y_val),
-        callbacks=[early_stop, reduce_lr, checkpoint],
-        verbose=1
-    )
-    
-    # evaluate on test set
-    print("\nEvaluating on test set...")
-    test_loss, test_acc, test_auc = model.evaluate(X_test, y_test)
-    print(f"Test accuracy: {test_acc:.4f}")
-    print(f"Test loss: {test_loss:.4f}")
-    print(f"Test AUC: {test_auc:.4f}")
-    
-    # save final model
-    model.save('models/hybrid_final.h5')
-    
-    # plot training history
-    plot_training_history(history, 'hybrid_training_history.png')
-    
-    # evaluate model and generate confusion matrix
-    from evaluation import evaluate_model
-    print("\nGenerating Hybrid evaluation metrics...")
-    evaluate_model(model, X_test, y_test, encoder)
-    
-    # rename confusion matrix for Hybrid
-    import shutil
-    if os.path.exists('confusion_matrix.png'):
-        shutil.move('confusion_matrix.png', 'hybrid_confusion_matrix.png')
-        print("Hybrid confusion matrix saved to hybrid_confusion_matrix.png")
-    
-    print("\nHybrid Training complete!")
-    print("Model saved to models/best_hybrid.h5")
-    
-    return model, history
+    return _train_one('hybrid', batch_size, bucketed, quantize)
 
 if __name__ == "__main__":
     # can run any model training
-    train_lstm()
\ No newline at end of file
+    train_lstm()
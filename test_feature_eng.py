@@ -3,7 +3,24 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from preprocessing import load_labelled_reviews, TextPreprocessor, remove_outliers
-from feature_engineering import TextEncoder
+from feature_engineering import (
+    TextEncoder, Vocabulary, write_model_metadata, check_model_vocabulary,
+    save_encoded_dataset, load_encoded_dataset
+)
+import tempfile
+import numpy as np
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+
+def tiny_reviews(max_len=20):
+    """36 short labelled reviews and an encoder fitted on them."""
+    reviews = ["great product love it", "terrible waste of money", "works well good value",
+               "broke after a day bad", "excellent quality great", "awful do not buy"] * 6
+    labels = np.array([1, 0, 1, 0, 1, 0] * 6)
+    encoder = TextEncoder(max_words=100, max_len=max_len)
+    encoder.fit_tokenizer(reviews, save=False)
+    return reviews, labels, encoder
+
 
 def test_pipeline():
     print("Testing feature engineering...")
@@ -44,5 +61,104 @@ def test_pipeline():
     print("\nSample:")
     print(X_train[0][:20])
 
+def test_vocabulary():
+    print("Testing compact vocabulary artifact...")
+
+    texts = [
+        "great product really love it", "terrible waste money",
+        "snake_case and hyphen-ated words", "UPPER case\tand tabs", "",
+    ]
+    encoder = TextEncoder(max_words=8, max_len=10)
+    encoder.fit_tokenizer(texts, save=False)
+
+    # unseen and out-of-range words must map to <OOV> exactly like keras does
+    queries = texts + ["never seen before", "love love money"]
+    expected = encoder.tokenizer.texts_to_sequences(queries)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vocab_path = encoder.vocab.save(os.path.join(tmp_dir, "vocab.bin"))
+        vocab = Vocabulary.load(vocab_path)
+
+        assert len(vocab) == 7
+        assert vocab.texts_to_sequences(queries) == expected
+        assert vocab.vocab_hash == encoder.vocab.vocab_hash
+        print(f"Loaded {len(vocab)} words, hash {vocab.vocab_hash}")
+
+        model_path = os.path.join(tmp_dir, "model.h5")
+        write_model_metadata(model_path, vocab)
+        assert check_model_vocabulary(model_path, vocab)
+
+        other = TextEncoder(max_words=8, max_len=10)
+        other.fit_tokenizer(["completely different words here"], save=False)
+        try:
+            check_model_vocabulary(model_path, other.vocab)
+            assert False, "vocabulary mismatch should raise"
+        except ValueError as e:
+            print(f"Mismatch detected: {e}")
+
+
+def test_encode_matrix():
+    print("Testing preallocated matrix encoder...")
+
+    texts = [
+        "great product really love it", "", "never seen before",
+        " ".join(["love", "money", "unknown"] * 10),  # longer than max_len
+    ]
+    encoder = TextEncoder(max_words=6, max_len=8)
+    encoder.fit_tokenizer(texts, save=False)
+
+    expected = pad_sequences(encoder.tokenizer.texts_to_sequences(texts),
+                             maxlen=8, padding='post', truncating='post')
+    encoded = encoder.texts_to_sequences(texts)
+
+    print(encoded)
+    assert encoded.dtype == np.uint16
+    assert encoded.shape == (4, 8)
+    assert np.array_equal(encoded, expected)
+
+
+def test_encoded_dataset():
+    print("\nTesting the memory-mapped encoded dataset...")
+
+    reviews, labels, encoder = tiny_reviews(max_len=12)
+    splits = encoder.prepare_data(reviews, labels)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        assert load_encoded_dataset(tmp_dir) is None
+        save_encoded_dataset(splits, encoder.vocab, tmp_dir,
+                             encoder.split_settings, encoder.split_indices)
+        dataset = load_encoded_dataset(tmp_dir)
+
+        assert isinstance(dataset.X_train, np.memmap)
+        assert dataset.X_train.dtype == np.uint16 and dataset.y_train.dtype == np.uint8
+        for saved, original in zip(dataset.splits(), splits):
+            assert np.array_equal(saved, original)
+        assert dataset.vocab.vocab_hash == encoder.vocab.vocab_hash
+        assert dataset.manifest["max_len"] == 12
+        assert dataset.manifest["split"]["random_state"] == 42
+
+        # the row numbers rebuild the test split from the reviews
+        rebuilt = encoder.texts_to_sequences([reviews[i] for i in dataset.test_index])
+        assert np.array_equal(rebuilt, dataset.X_test)
+        assert [labels[i] for i in dataset.test_index] == dataset.y_test.tolist()
+
+        # evaluation reads the saved test split instead of refitting
+        from evaluation import load_test_split
+        X_test, y_test = load_test_split(encoder.vocab, tmp_dir)
+        assert np.array_equal(X_test, splits[2]) and np.array_equal(y_test, splits[5])
+
+        # an array that no longer matches the manifest is refused
+        np.save(os.path.join(tmp_dir, "y_test.npy"), np.zeros(3, dtype=np.uint8))
+        try:
+            load_encoded_dataset(tmp_dir)
+            assert False, "expected a manifest mismatch"
+        except ValueError:
+            pass
+    print("Encoded dataset OK")
+
+
 if __name__ == "__main__":
     test_pipeline()
+    test_vocabulary()
+    test_encode_matrix()
+    test_encoded_dataset()
@@ -0,0 +1,59 @@
+import sys
+import os
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+
+HEAVY_MODULES = ["nltk", "numpy", "pandas", "tensorflow"]
+
+PROBE = """
+import sys, ssl, time
+sys.path.insert(0, {src!r})
+default_context = ssl._create_default_https_context
+
+start = time.perf_counter()
+import preprocessing
+import_ms = (time.perf_counter() - start) * 1000
+
+start = time.perf_counter()
+preprocessing.TextPreprocessor()
+init_ms = (time.perf_counter() - start) * 1000
+
+print(import_ms)
+print(init_ms)
+print(",".join(m for m in {heavy!r} if m in sys.modules))
+print(ssl._create_default_https_context is default_context)
+"""
+
+
+def measure_import():
+    # a fresh interpreter, so nothing is already cached in sys.modules
+    probe = PROBE.format(src=SRC_DIR, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True
+    ).stdout.split("\n")
+
+    return {
+        "import_ms": float(output[0]),
+        "init_ms": float(output[1]),
+        "heavy_loaded": [m for m in output[2].split(",") if m],
+        "ssl_untouched": output[3] == "True",
+    }
+
+
+def test_import_time():
+    print("Benchmarking preprocessing import...")
+
+    result = measure_import()
+    print(f"import preprocessing: {result['import_ms']:.1f} ms")
+    print(f"TextPreprocessor():   {result['init_ms']:.1f} ms")
+    print(f"heavy modules loaded: {result['heavy_loaded'] or 'none'}")
+
+    # the timings are only printed, a loaded machine makes them noisy; a cold
+    # import used to take over a second because nltk was loaded eagerly
+    assert result["heavy_loaded"] == [], result["heavy_loaded"]
+    assert result["ssl_untouched"], "importing preprocessing patched ssl"
+
+
+if __name__ == "__main__":
+    test_import_time()
@@ -0,0 +1,225 @@
+import sys
+import os
+import re
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from preprocessing import (
+    get_data_directory, iter_reviews, parse_reviews,
+    parse_review_record, record_text, load_labelled_reviews, TextPreprocessor,
+    corpus_cache_key, save_corpus_cache, load_corpus_cache, LemmaCache
+)
+
+
+def split_parse(file_path):
+    # the original whole-file parser, kept here as the reference
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        data = f.read()
+
+    reviews = []
+    for chunk in data.split("<review>"):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        if "</review>" in chunk:
+            chunk = chunk.split("</review>")[0]
+        chunk = chunk.strip()
+        if chunk:
+            reviews.append(chunk)
+    return reviews
+
+
+def regex_clean(text):
+    # the original chain of re.sub passes, kept here as the reference
+    text = text.lower()
+    text = re.sub(r"<.*?>", "", text)
+    text = re.sub(r"http\S+|www\.\S+", "", text)
+    text = re.sub(r"\S+@\S+", "", text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    text = re.sub(r"\d+", "", text)
+    return " ".join(text.split())
+
+
+def test_streaming_parser():
+    print("Testing streaming review parser...")
+
+    file_path = os.path.join(get_data_directory(), "books", "positive.review")
+    expected = split_parse(file_path)
+
+    assert parse_reviews(file_path) == expected
+    print(f"Default block size: {len(expected)} reviews match")
+
+    # tiny blocks force <review> tags to straddle block boundaries
+    for block_size in [1, 7, 4096]:
+        assert list(iter_reviews(file_path, block_size=block_size)) == expected
+        print(f"Block size {block_size}: match")
+
+
+def test_review_record():
+    print("Testing review field extraction...")
+
+    file_path = os.path.join(get_data_directory(), "books", "positive.review")
+    review = next(iter_reviews(file_path))
+    record = parse_review_record(review)
+
+    print(record._replace(review_text=record.review_text[:40] + "..."))
+
+    assert record.asin == "0785758968"
+    assert record.title == "One of the best Crichton novels"
+    assert record.rating == 5.0
+    assert record.helpful == (0, 1)
+    assert record.product_type == "books"
+    assert record.date == "July 1, 2006"
+    assert record.review_text.startswith("Sphere by Michael Crichton")
+
+    # metadata must not leak into the text we preprocess
+    text = record_text(record)
+    assert "0785758968" not in text
+    assert "Joseph M" not in text
+
+
+def test_parallel_preprocessing():
+    print("Testing process-pool preprocessing...")
+
+    reviews, labels = load_labelled_reviews()
+    sample = reviews[:200]
+
+    preprocessor = TextPreprocessor()
+    serial = preprocessor.preprocess_reviews(sample)
+    parallel = preprocessor.preprocess_reviews(sample, n_jobs=2, chunk_size=30)
+
+    assert parallel == serial
+    print(f"{len(parallel)} reviews identical in the same order")
+
+    # custom stop words must reach the workers too
+    custom = TextPreprocessor(stop_words={"book", "read", "great"})
+    serial = custom.preprocess_reviews(sample)
+    parallel = custom.preprocess_reviews(sample, n_jobs=2, chunk_size=30)
+    assert parallel == serial
+    assert serial != preprocessor.preprocess_reviews(sample)
+    custom.stop_words = {"movie"}
+    assert custom.preprocess_reviews(sample, n_jobs=2, chunk_size=30) == \
+        custom.preprocess_reviews(sample)
+    print("Custom stop words identical in parallel")
+
+
+def test_corpus_cache():
+    print("Testing preprocessed corpus cache...")
+
+    reviews = ["great book really enjoyed", "", "naïve café plot terrible"]
+    labels = [1, 0, 0]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "corpus.npz")
+        save_corpus_cache(path, reviews, labels)
+        assert load_corpus_cache(path) == (reviews, labels)
+        print("Round trip OK")
+
+        # the key follows both the file contents and the settings
+        source = os.path.join(tmp_dir, "positive.review")
+        with open(source, "w") as f:
+            f.write("<review>one</review>")
+
+        key = corpus_cache_key(TextPreprocessor(), [source])
+        assert corpus_cache_key(TextPreprocessor(), [source]) == key
+        assert corpus_cache_key(TextPreprocessor(min_token_length=4), [source]) != key
+
+        with open(source, "a") as f:
+            f.write("<review>two</review>")
+        assert corpus_cache_key(TextPreprocessor(), [source]) != key
+        print("Cache key invalidation OK")
+
+
+def test_lemma_cache():
+    print("Testing LRU lemma cache...")
+
+    calls = []
+
+    def lemmatize(token):
+        calls.append(token)
+        return token.rstrip("s")
+
+    cache = LemmaCache(max_size=2)
+    assert cache.lookup("cars", lemmatize) == "car"
+    assert cache.lookup("dogs", lemmatize) == "dog"
+    assert cache.lookup("cars", lemmatize) == "car"
+    # "dogs" is now least recently used and gets evicted
+    cache.lookup("cats", lemmatize)
+    cache.lookup("dogs", lemmatize)
+
+    assert calls == ["cars", "dogs", "cats", "dogs"]
+    stats = cache.stats()
+    print(stats)
+    assert stats["hits"] == 1 and stats["misses"] == 4 and stats["size"] == 2
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = cache.save(os.path.join(tmp_dir, "lemmas.json"))
+        loaded = LemmaCache.load(path)
+        assert loaded.items() == cache.items()
+        print("Save/load OK")
+
+    # lemmatizing through the cache must not change the output
+    reviews, labels = load_labelled_reviews()
+    plain = TextPreprocessor(lemma_cache_size=0).preprocess_reviews(reviews[:100])
+    cached = TextPreprocessor(lemma_cache_size=500)
+    assert cached.preprocess_reviews(reviews[:100]) == plain
+    print(cached.lemma_cache.stats())
+
+    # lookups made in pool workers are counted in the parent
+    serial_stats = cached.lemma_cache.stats()
+    pooled = TextPreprocessor(lemma_cache_size=500)
+    assert pooled.preprocess_reviews(reviews[:100], n_jobs=2, chunk_size=25) == plain
+    pooled_stats = pooled.lemma_cache.stats()
+    print(pooled_stats)
+    assert pooled_stats["hits"] + pooled_stats["misses"] == serial_stats["hits"] + serial_stats["misses"]
+    assert pooled_stats["hits"] > 0
+
+
+def test_clean_text_parity():
+    print("Testing single-pass clean_text against the regex chain...")
+
+    reviews, labels = load_labelled_reviews(raw=True)
+    reviews += [
+        "a<b>@c d", "ht<i>tp://x.com hi", "WWW.Example.com/page ok",
+        "mail me@a.b, or visit http://a.b.", "<a\nb> <c>",
+        "١٢٣ ²³ naïve İstanbul ß a_b-c", "tab\tsep\r\nline\x1cend", "", "   ",
+    ]
+
+    preprocessor = TextPreprocessor()
+    assert preprocessor.clean_many(reviews) == [regex_clean(r) for r in reviews]
+    print(f"{len(reviews)} texts identical")
+
+
+def test_fast_tokenizer():
+    print("Testing fast tokenizer backend...")
+
+    reviews, labels = load_labelled_reviews()
+    sample = reviews[:300]
+
+    nltk_output = TextPreprocessor(tokenizer="nltk").preprocess_reviews(sample)
+    fast_output = TextPreprocessor(tokenizer="fast").preprocess_reviews(sample)
+
+    # the only known differences are Treebank contraction splits (cannot, gonna, ...)
+    contractions = {"cannot", "gonna", "wanna", "gotta", "gimme", "lemme"}
+    for nltk_review, fast_review in zip(nltk_output, fast_output):
+        if nltk_review != fast_review:
+            assert contractions & set(fast_review.split()), fast_review
+
+    same = sum(a == b for a, b in zip(nltk_output, fast_output))
+    print(f"{same}/{len(sample)} reviews identical")
+
+    try:
+        TextPreprocessor(tokenizer="spacy")
+        assert False, "unknown tokenizer should raise"
+    except ValueError as e:
+        print(f"Unknown tokenizer rejected: {e}")
+
+
+if __name__ == "__main__":
+    test_streaming_parser()
+    test_review_record()
+    test_parallel_preprocessing()
+    test_corpus_cache()
+    test_lemma_cache()
+    test_clean_text_parity()
+    test_fast_tokenizer()
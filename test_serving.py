@@ -0,0 +1,509 @@
+import sys
+import os
+import threading
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import numpy as np
+
+from serving import (
+    InferenceModel, TFLiteInferenceModel, MicroBatcher, PredictionCache, ModelRegistry, UnknownModelError,
+    SharedModelStore, SharedVocabulary, artifact_version, label_prediction,
+    read_batch_texts, predict_cached, iter_ndjson_lines, iter_ndjson_answers, chunked
+)
+
+
+def test_micro_batcher():
+    print("Testing micro-batching of concurrent predictions...")
+
+    calls = []
+
+    def predict_fn(rows):
+        calls.append(len(rows))
+        # each output depends only on its own row
+        return rows.sum(axis=1).astype(np.float32)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=50)
+    rows = [np.full(5, i, dtype=np.uint16) for i in range(20)]
+    results = [None] * len(rows)
+
+    def worker(i):
+        results[i] = batcher.predict(rows[i], timeout=10)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(rows))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # every caller gets the output for its own row
+    assert results == [5.0 * i for i in range(len(rows))]
+    assert sum(calls) == len(rows)
+    assert max(calls) <= 8
+    assert len(calls) < len(rows), "concurrent requests should share batches"
+    print(f"Batch sizes: {calls}")
+
+    stats = batcher.stats()
+    print(stats)
+    assert stats["requests"] == len(rows)
+    assert stats["batches"] == len(calls)
+    batcher.close()
+
+
+def test_micro_batcher_errors():
+    print("Testing error propagation...")
+
+    def predict_fn(rows):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(predict_fn, max_wait_ms=1)
+    try:
+        batcher.predict(np.zeros(5, dtype=np.uint16), timeout=10)
+        assert False, "predict_fn errors should reach the caller"
+    except RuntimeError as e:
+        print(f"Error propagated: {e}")
+
+    # the batcher keeps serving after a failed batch
+    batcher.predict_fn = lambda rows: rows[:, 0]
+    assert batcher.predict(np.ones(5, dtype=np.uint16), timeout=10) == 1
+    batcher.close()
+
+
+def test_micro_batcher_models():
+    print("Testing per-model grouping in the micro-batcher...")
+
+    calls = []
+
+    def model_a(rows):
+        calls.append(("a", len(rows)))
+        return np.zeros(len(rows))
+
+    def model_b(rows):
+        calls.append(("b", len(rows)))
+        return np.ones(len(rows))
+
+    batcher = MicroBatcher(max_batch_size=8, max_wait_ms=50)
+    row = np.zeros(5, dtype=np.uint16)
+    futures = [batcher.submit(row, predict_fn=model_a if i % 2 else model_b) for i in range(6)]
+    outputs = [future.result(timeout=10) for future in futures]
+
+    assert outputs == [1, 0, 1, 0, 1, 0]
+    assert sorted(calls) == [("a", 3), ("b", 3)]
+    print(f"Calls: {calls}")
+    batcher.close()
+
+
+def test_label_prediction():
+    assert label_prediction(0.9) == ("Positive", 0.9)
+    sentiment, confidence = label_prediction(np.float32(0.25))
+    assert sentiment == "Negative" and abs(confidence - 0.75) < 1e-6
+
+
+def test_inference_model():
+    print("Testing traced inference path against model.predict...")
+
+    from model import create_cnn_model
+
+    model = create_cnn_model(1000, 50)
+    inference = InferenceModel(model, max_len=50)
+
+    rng = np.random.default_rng(0)
+    for batch_size in [1, 7]:
+        rows = rng.integers(0, 1000, size=(batch_size, 50)).astype(np.uint16)
+        expected = model.predict(rows, verbose=0)
+        assert np.allclose(inference(rows), expected, atol=1e-5)
+        assert inference.predict(rows).shape == (batch_size,)
+        print(f"Batch {batch_size}: match")
+
+
+def test_bucketed_inference():
+    print("Testing length-bucketed inference against full padding...")
+
+    from model import create_lstm_model, create_cnn_model, create_hybrid_model
+
+    rng = np.random.default_rng(0)
+    lengths = [0, 3, 12, 30, 49, 50, 8]
+    rows = np.zeros((len(lengths), 50), dtype=np.uint16)
+    for row, length in enumerate(lengths):
+        rows[row, :length] = rng.integers(1, 1000, size=length)
+
+    for create in [create_lstm_model, create_cnn_model, create_hybrid_model]:
+        model = create(1000, 50)
+        padded = InferenceModel(model, max_len=50)
+        bucketed = InferenceModel(model, max_len=50, buckets=(8, 16, 32))
+        assert bucketed.buckets == [8, 16, 32], f"{create.__name__} should support bucketing"
+        assert np.allclose(bucketed.predict(rows), padded.predict(rows), atol=1e-5)
+        assert np.allclose(bucketed.predict(rows[1:2]), padded.predict(rows[1:2]), atol=1e-5)
+        print(f"{create.__name__}: margin {bucketed.margin}, "
+              f"ceilings {[bucketed.bucket_ceiling(n) for n in lengths]}")
+        assert model.input_shape == (None, None), f"{create.__name__} should accept any length"
+
+    # an output that depends on the padded length turns bucketing off
+    # without a mask, and is an error with one
+    import tensorflow as tf
+
+    for mask_zero in [False, True]:
+        inputs = tf.keras.Input(shape=(None,))
+        embedded = tf.keras.layers.Embedding(1000, 4, mask_zero=mask_zero)(inputs)
+        padded_length = tf.keras.layers.Lambda(
+            lambda x: tf.reduce_mean(x, axis=1) + tf.cast(tf.shape(x)[1], tf.float32) / 100)(embedded)
+        model = tf.keras.Model(inputs, tf.keras.layers.Dense(1, activation="sigmoid")(padded_length))
+        try:
+            bucketed = InferenceModel(model, max_len=50, buckets=(8, 16, 32))
+            assert not mask_zero, "a masked model that disagrees should be rejected"
+            assert bucketed.buckets is None
+        except ValueError as e:
+            assert mask_zero
+            print(f"Rejected: {e}")
+
+
+def test_quantized_model():
+    print("Testing quantized .tflite exports against the float32 model...")
+
+    from model import create_cnn_model, create_hybrid_model
+    from quantization import convert_model
+
+    model = create_cnn_model(1000, 50)
+    inference = InferenceModel(model, max_len=50)
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ["dynamic", "float16"]:
+            path = os.path.join(tmp_dir, f"model_{mode}.tflite")
+            with open(path, "wb") as f:
+                f.write(convert_model(model, 50, mode))
+            quantized = TFLiteInferenceModel(path, max_len=50)
+
+            for batch_size in [1, 7, 1]:
+                rows = rng.integers(0, 1000, size=(batch_size, 50)).astype(np.uint16)
+                outputs = quantized.predict(rows)
+                assert outputs.shape == (batch_size,)
+                assert np.allclose(outputs, inference.predict(rows), atol=0.05)
+            print(f"{mode}: {os.path.getsize(path):,} bytes, outputs within 0.05")
+
+        # recurrent layers must convert to builtin ops too, or the stock
+        # interpreter cannot run the export
+        hybrid = create_hybrid_model(1000, 20, embedding_dim=16, filters=8, lstm_units=8, dense_units=8)
+        path = os.path.join(tmp_dir, "hybrid.tflite")
+        with open(path, "wb") as f:
+            f.write(convert_model(hybrid, 20))
+        rows = rng.integers(1, 1000, size=(5, 20)).astype(np.uint16)
+        rows[:, 12:] = 0
+        outputs = TFLiteInferenceModel(path, max_len=20).predict(rows)
+        assert np.allclose(outputs, InferenceModel(hybrid, max_len=20).predict(rows), atol=0.05)
+        print("hybrid: builtin ops only, outputs within 0.05")
+
+
+def test_prediction_cache():
+    print("Testing prediction cache...")
+
+    cache = PredictionCache(max_size=2, ttl=None)
+    cache.put("great book", 0.9)
+    cache.put("bad book", 0.1)
+    assert cache.get("great book") == 0.9
+    # "bad book" is least recently used and gets evicted
+    cache.put("fine book", 0.6)
+    assert cache.get("bad book") is None
+    assert len(cache) == 2
+
+    stats = cache.stats()
+    print(stats)
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+    cache = PredictionCache(ttl=0.05)
+    cache.put("great book", 0.9)
+    time.sleep(0.1)
+    assert cache.get("great book") is None
+    assert cache.stats()["expired"] == 1
+
+    # a TTL of 0 turns the cache off rather than keeping entries forever
+    cache = PredictionCache(ttl=0)
+    cache.put("great book", 0.9)
+    assert cache.get("great book") is None and len(cache) == 0
+    print("TTL expiry OK")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, "model.h5")
+        with open(model_path, "w") as f:
+            f.write("v1")
+
+        # the servers key entries on (model version, text)
+        cache = PredictionCache()
+        cache.put((artifact_version(model_path), "great book"), 0.9)
+        assert cache.get((artifact_version(model_path), "great book")) == 0.9
+
+        with open(model_path, "w") as f:
+            f.write("v2 retrained")
+        assert cache.get((artifact_version(model_path), "great book")) is None
+        print("Retrained model misses the old entries OK")
+
+    # both servers label batches through predict_cached
+    calls = []
+
+    def predict(texts):
+        calls.append(texts)
+        return [0.9 if "great" in text else 0.2 for text in texts]
+
+    cache = PredictionCache()
+    preprocess = lambda texts: [text.lower() for text in texts]
+    results = predict_cached(["Great", "bad", "great"], "v1", cache, preprocess, predict)
+    assert [r["sentiment"] for r in results] == ["Positive", "Negative", "Positive"]
+    assert calls == [["great", "bad"]]
+    predict_cached(["GREAT", "new"], "v1", cache, preprocess, predict)
+    assert calls[-1] == ["new"]
+    print("Batch lookups score only the misses OK")
+
+
+class FakeVocab:
+    max_len = 5
+
+    def encode(self, texts, max_len=None):
+        return np.zeros((len(texts), self.max_len), dtype=np.uint16)
+
+
+class FakeModel:
+    def __init__(self, path):
+        with open(path) as f:
+            self.output = float(f.read())
+
+    def predict(self, rows):
+        return np.full(len(rows), self.output)
+
+
+def write_checkpoint(path, output):
+    with open(path, "w") as f:
+        f.write(str(output))
+    # distinct mtimes in the past, so every rewrite is seen even on coarse clocks
+    write_checkpoint.mtime += 1
+    os.utime(path, (write_checkpoint.mtime, write_checkpoint.mtime))
+
+
+write_checkpoint.mtime = time.time() - 3600
+
+
+def test_model_registry():
+    print("Testing model registry...")
+
+    loaded = []
+
+    def load_model(path, vocab):
+        loaded.append(os.path.basename(path))
+        return FakeModel(path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_checkpoint(os.path.join(tmp_dir, "best_cnn.h5"), 0.25)
+        write_checkpoint(os.path.join(tmp_dir, "best_lstm.h5"), 0.5)
+        write_checkpoint(os.path.join(tmp_dir, "notes.txt"), 0)
+
+        registry = ModelRegistry(tmp_dir, default="cnn", load_model=load_model,
+                                 load_vocab=FakeVocab, min_age_s=0)
+        assert registry.names() == ["cnn", "lstm"]
+        assert loaded == []
+
+        # loaded lazily, once
+        old = registry.get()
+        assert registry.get("cnn") is old
+        assert loaded == ["best_cnn.h5"]
+        assert registry.get("lstm").predict(np.zeros((2, 5)))[0] == 0.5
+
+        try:
+            registry.get("bert")
+            assert False, "unknown models should raise"
+        except UnknownModelError as e:
+            print(f"Unknown model rejected: {e}")
+
+        # a new checkpoint is swapped in; a request still holding the old one finishes
+        write_checkpoint(os.path.join(tmp_dir, "best_cnn.h5"), 0.75)
+        new = registry.get("cnn")
+        assert new is not old and new.version != old.version
+        assert new.predict(np.zeros((1, 5)))[0] == 0.75
+        assert old.predict(np.zeros((1, 5)))[0] == 0.25
+        print("Hot swap OK")
+
+        # a broken checkpoint keeps the previous model serving, and is not retried
+        write_checkpoint(os.path.join(tmp_dir, "best_cnn.h5"), "corrupt")
+        assert registry.get("cnn") is new
+        assert registry.get("cnn") is new
+        stats = registry.stats()
+        print(stats)
+        assert stats["swaps"] == 1 and stats["failed_loads"] == 1
+        assert loaded.count("best_cnn.h5") == 3
+
+
+def test_shared_vocabulary():
+    print("Testing the shared vocabulary table against Vocabulary.encode...")
+
+    from feature_engineering import Vocabulary
+
+    texts = ["great great book", "naïve café review", "unknownword and book",
+             "", "a b c d e f g h i j k l"]
+    for oov_token in ["<OOV>", None]:
+        words = ["<OOV>", "book", "great", "and", "café", "a", "b"] if oov_token else ["book", "great"]
+        vocab = Vocabulary(words, max_words=100, max_len=6, oov_token=oov_token)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            header = SharedVocabulary.export(vocab, tmp_dir)
+            shared = SharedVocabulary.attach(tmp_dir, header)
+            assert len(shared) == len(vocab) and shared.vocab_hash == vocab.vocab_hash
+            assert np.array_equal(shared.encode(texts), vocab.encode(texts))
+            # a word longer than any in the table must not match a prefix of it
+            assert list(shared.lookup(["bookshelf"])) == ([vocab.oov_id] if oov_token else [])
+            del shared
+        print(f"oov_token={oov_token!r}: match")
+
+
+def test_shared_model_store():
+    print("Testing shared weights against the saved checkpoint...")
+
+    from feature_engineering import Vocabulary, write_model_metadata
+    from model import create_cnn_model
+
+    vocab = Vocabulary([f"word{i}" for i in range(200)], max_words=1000, max_len=50)
+    model = create_cnn_model(1000, 50)
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, 200, size=(7, 50)).astype(np.uint16)
+    expected = model.predict(rows, verbose=0)[:, 0]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        models_dir = os.path.join(tmp_dir, "models")
+        os.makedirs(models_dir)
+        model_path = os.path.join(models_dir, "best_cnn.h5")
+        vocab_path = vocab.save(os.path.join(tmp_dir, "vocab.bin"))
+        model.save(model_path)
+        write_model_metadata(model_path, vocab)
+
+        store = SharedModelStore(os.path.join(tmp_dir, "shared"))
+        assert store.export(models_dir, vocab_path=vocab_path) == ["cnn"]
+
+        shared_vocab = store.attach_vocabulary(vocab_path)
+        assert np.array_equal(shared_vocab.encode(["word1 word7"]), vocab.encode(["word1 word7"]))
+
+        inference = store.load_model(model_path, shared_vocab)
+        assert np.allclose(inference.predict(rows), expected, atol=1e-5)
+        print("Shared model matches the checkpoint")
+
+        # a checkpoint rewritten after the export is no longer served from it
+        write_checkpoint(model_path, 0)
+        assert store._read_current("cnn.json", model_path) is None
+
+
+def test_batch_payloads():
+    print("Testing /predict/batch payload parsing...")
+
+    assert read_batch_texts(["a", "b"]) == ["a", "b"]
+    assert read_batch_texts({"texts": ["a"]}) == ["a"]
+    for payload in [None, "a", {"text": "a"}, ["a", 1]]:
+        try:
+            read_batch_texts(payload)
+            assert False, f"{payload!r} should be rejected"
+        except ValueError as e:
+            print(f"Rejected {payload!r}: {e}")
+
+    lines = [b'"first"\n', b"\n", b'{"text": "second"}\n', b"{broken"]
+    assert list(iter_ndjson_lines(lines)) == [(1, "first", None), (3, "second", None),
+                                             (4, None, "Line 4 is not valid JSON")]
+
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_ndjson_answers():
+    print("Testing NDJSON answers stay one per input line...")
+
+    calls = []
+
+    def predict_texts(texts):
+        calls.append(texts)
+        return [{"text": text} for text in texts]
+
+    # a valid line before a bad one is still scored and answered
+    answers = list(iter_ndjson_answers([b'"a"\n', b"{broken\n"], predict_texts, 10))
+    assert answers == [{"text": "a"},
+                       {"line": 2, "error": "Line 2 is not valid JSON", "success": False}]
+
+    lines = [b'"a"\n', b"\n", b"{broken\n", b'{"text": "b"}\n', b"7\n", b'"c"\n']
+    answers = list(iter_ndjson_answers(lines, predict_texts, 2))
+    assert answers == [{"text": "a"},
+                       {"line": 3, "error": "Line 3 is not valid JSON", "success": False},
+                       {"text": "b"},
+                       {"line": 5, "error": "Line 5 has no text", "success": False},
+                       {"text": "c"}]
+    # blank lines are skipped, bad lines never reach the model
+    assert calls[1:] == [["a"], ["b"], ["c"]]
+    print("Bad lines answered in place OK")
+
+
+def test_ndjson_stream():
+    print("Testing incremental NDJSON streaming in the async server...")
+
+    import asyncio
+    import json
+    import serve_async
+
+    class FakeState:
+        async def predict_many(self, texts, served):
+            return [{'text': text} for text in texts]
+
+    async def run(messages):
+        events = []
+
+        async def receive():
+            message = messages.pop(0)
+            events.append(('received', message.get('body')))
+            return message
+
+        async def send(message):
+            events.append((message['type'], message.get('body')))
+
+        await serve_async.handle_predict_batch_stream(receive, None, send)
+        return events
+
+    serve_async.state = FakeState()
+    events = asyncio.run(run([
+        {'type': 'http.request', 'body': b'"a"\n{"text": "b', 'more_body': True},
+        {'type': 'http.request', 'body': b'"}\n"c"', 'more_body': False},
+    ]))
+    bodies = [body for kind, body in events if kind == 'http.response.body']
+    assert b''.join(bodies).splitlines() == [b'{"text": "a"}', b'{"text": "b"}', b'{"text": "c"}']
+    # "a" is answered before the second chunk is read
+    assert events.index(('http.response.body', b'{"text": "a"}\n')) < \
+        events.index(('received', b'"}\n"c"'))
+    print("Lines answered as chunks arrive OK")
+
+    # a line number in an error counts lines across chunks
+    events = asyncio.run(run([
+        {'type': 'http.request', 'body': b'"a"\n', 'more_body': True},
+        {'type': 'http.request', 'body': b'{broken\n', 'more_body': False},
+    ]))
+    assert b'Line 2 is not valid JSON' in b''.join(body or b'' for _, body in events)
+
+    # a bad line does not cost the valid lines of its chunk their answers
+    events = asyncio.run(run([
+        {'type': 'http.request', 'body': b'"a"\n{broken\n"c"\n', 'more_body': False},
+    ]))
+    lines = b''.join(body or b'' for kind, body in events if kind == 'http.response.body').splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {'text': 'a'}, {'line': 2, 'error': 'Line 2 is not valid JSON', 'success': False}, {'text': 'c'}]
+    print("Bad line answered in place OK")
+
+    # a client that went away gets nothing, not an error response
+    events = asyncio.run(run([{'type': 'http.disconnect'}]))
+    assert [kind for kind, _ in events] == ['received']
+    print("Disconnect OK")
+
+
+if __name__ == "__main__":
+    test_micro_batcher()
+    test_micro_batcher_errors()
+    test_micro_batcher_models()
+    test_label_prediction()
+    test_inference_model()
+    test_bucketed_inference()
+    test_quantized_model()
+    test_prediction_cache()
+    test_model_registry()
+    test_shared_vocabulary()
+    test_shared_model_store()
+    test_batch_payloads()
+    test_ndjson_answers()
+    test_ndjson_stream()
@@ -1,8 +1,20 @@
 import sys
 import os
+import json
+import tempfile
+import numpy as np
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from train import train_lstm
+import train
+from train import train_lstm, make_dataset, fit_inputs, train_models, TrainingData
+from test_feature_eng import tiny_reviews
+
+
+def tiny_training_data():
+    """The tiny reviews split 24/6/6 into training data with max_len 20."""
+    reviews, labels, encoder = tiny_reviews()
+    X = encoder.texts_to_sequences(reviews)
+    return TrainingData(encoder, X[:24], X[24:30], X[30:], labels[:24], labels[24:30], labels[30:])
 
 def quick_test():
     print("Quick training test with small data...")
@@ -19,5 +31,125 @@ def quick_test():
     except Exception as e:
         print(f"Error: {e}")
 
+def test_bucketed_dataset():
+    print("Testing the bucketed tf.data pipeline...")
+
+    from model import create_lstm_model
+
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(0, 50, size=100)
+    X = np.zeros((100, 50), dtype=np.uint16)
+    for row, length in enumerate(lengths):
+        X[row, :length] = rng.integers(1, 100, size=length)
+    y = rng.integers(0, 2, size=100)
+
+    seen, tokens = 0, 0
+    for batch, labels in make_dataset(X, y, batch_size=8, boundaries=(16, 32)):
+        assert batch.shape[1] in (15, 31, 50), batch.shape
+        assert batch.shape[0] <= 8 and batch.shape[0] == labels.shape[0]
+        seen += batch.shape[0]
+        tokens += np.count_nonzero(batch.numpy())
+    # every row arrives once with all of its tokens
+    assert seen == len(X) and tokens == np.count_nonzero(X)
+
+    # streamed from a memory-mapped copy, row by row, with the same batches
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'X.npy')
+        np.save(path, X)
+        mapped = np.load(path, mmap_mode='r')
+        for shuffle in (False, True):
+            batches = list(make_dataset(mapped, y, batch_size=8, boundaries=(16, 32),
+                                        shuffle=shuffle, streamed=True))
+            assert sum(len(labels) for _, labels in batches) == len(X)
+            assert sum(np.count_nonzero(batch.numpy()) for batch, _ in batches) == np.count_nonzero(X)
+            assert all(batch.shape[1] in (15, 31, 50) for batch, _ in batches)
+        del mapped
+    print("Streamed bucketed dataset OK")
+
+    model = create_lstm_model(100, 50)
+    history = model.fit(**fit_inputs(X[:80], y[:80], X[80:], y[80:], batch_size=8, bucketed=True),
+                        epochs=1, verbose=0)
+    print(f"Bucketed fit OK: {history.history['loss']}")
+
+
+def test_train_models():
+    print("Testing the shared training pipeline on a tiny dataset...")
+
+    data = tiny_training_data()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = {'epochs': 1, 'batch_size': 8, 'max_len': 20, 'models_dir': tmp_dir,
+                  'quantize': False, 'plots': False, 'save_final': False, 'verbose': 0}
+        results = train_models(['cnn', 'hybrid'], config, data=data)
+
+        assert [result['model_name'] for result in results] == ['cnn', 'hybrid']
+        for name in ['cnn', 'hybrid']:
+            assert os.path.exists(os.path.join(tmp_dir, f'best_{name}.h5'))
+            assert os.path.exists(os.path.join(tmp_dir, f'best_{name}.meta.json'))
+        with open(os.path.join(tmp_dir, 'training_report.json')) as f:
+            report = json.load(f)
+        assert report['config']['epochs'] == 1
+        assert {m['model_name'] for m in report['models']} == {'cnn', 'hybrid'}
+        assert report['timing']['mode'] == 'sequential'
+        print("Report OK")
+
+        # a failed export is recorded, the trained checkpoint is kept
+        def failing_export(*args):
+            raise RuntimeError("converter crashed")
+        export_quantized, train.export_quantized = train.export_quantized, failing_export
+        try:
+            result = train.train_model('cnn', data, dict(config, quantize=True))
+        finally:
+            train.export_quantized = export_quantized
+        assert result['quantize_error'] == "converter crashed"
+        assert 'quantized_accuracy' not in result
+        assert os.path.exists(result['checkpoint'])
+        print("Failed export recorded OK")
+
+        # the same run, one process per model on the shared split
+        results = train_models(['cnn', 'hybrid'], config, data=data, parallel=True)
+        assert [result['model_name'] for result in results] == ['cnn', 'hybrid']
+        assert all(len(result['history']['loss']) == 1 for result in results)
+        with open(os.path.join(tmp_dir, 'training_report.json')) as f:
+            assert json.load(f)['timing']['mode'] == 'parallel'
+        print("Parallel training OK")
+
+
+def test_sweep():
+    print("Testing a pruned hyperparameter sweep on a tiny dataset...")
+
+    from sweep import run_sweep, rung_epochs, should_prune, SweepStore
+
+    assert rung_epochs(1, 9, 3) == [1, 3]
+    # fewer than eta reports at a rung: nothing to compare against yet
+    assert not should_prune({1: 0.9, 2: 0.5}, 1, eta=3)
+    assert should_prune({1: 0.9, 2: 0.5, 3: 0.6}, 1, eta=3)
+    assert not should_prune({1: 0.9, 2: 0.5, 3: 0.6}, 2, eta=3)
+
+    data = tiny_training_data()
+    space = {'embedding_dim': [8, 16], 'filters': (4, 8), 'kernel_size': [3],
+             'dense_units': [8], 'learning_rate': (1e-3, 1e-2, 'log'), 'batch_size': [8]}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trials = run_sweep('cnn', space, n_trials=4, max_epochs=3, min_epochs=1, eta=2,
+                           n_jobs=2, data=data, directory=tmp_dir, name='tiny')
+        assert len(trials) == 4
+        assert all(t['state'] in ('complete', 'pruned') for t in trials)
+        assert all(4 <= t['params']['filters'] <= 8 for t in trials)
+        assert os.path.exists(os.path.join(tmp_dir, 'tiny.csv'))
+
+        # resuming adds trials up to the new total and keeps the finished ones
+        store = SweepStore(os.path.join(tmp_dir, 'tiny.sqlite'))
+        first = [t['params'] for t in store.trials()]
+        trials = run_sweep('cnn', space, n_trials=5, max_epochs=3, min_epochs=1, eta=2,
+                           n_jobs=2, data=data, directory=tmp_dir, name='tiny')
+        assert len(trials) == 5
+        assert [t['params'] for t in trials[:4]] == first
+        print("Sweep OK")
+
+
 if __name__ == "__main__":
+    test_bucketed_dataset()
+    test_train_models()
+    test_sweep()
     quick_test()